@@ -6,7 +6,7 @@ Handles chat queries and reports.
 from fastapi import APIRouter, HTTPException, Depends, Header, Query
 from fastapi.responses import StreamingResponse
 import json
-from app.services import RAGService, ReportService
+from app.services import RAGService, ReportService, container
 from app.schemas.common_types import (
     ChatQuery,
     ChatResponse,
@@ -20,7 +20,7 @@ router = APIRouter(prefix='/chat', tags=['chat'])
 
 # Service dependencies
 def get_rag_service() -> RAGService:
-    return RAGService()
+    return container.get_rag_service()
 
 
 def get_report_service() -> ReportService:
@@ -4,11 +4,13 @@ Handles document upload, processing, and deletion.
 """
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Header
+import asyncio
 import os
-from app.core.config import ADMIN_TOKEN
-from app.services import CorpusService
-from app.schemas.common_types import CorpusUploadResponse, CorpusDeleteResponse
+from app.core.config import ADMIN_TOKEN, UPLOAD_MAX_BYTES
+from app.services import CorpusService, IngestionJobService, container
+from app.schemas.common_types import CorpusJobResponse, CorpusDeleteResponse
 from app.utils import print_info, print_warning, print_error
+from app.utils.storage import UploadTooLargeError
 
 router = APIRouter(prefix="/corpus", tags=["corpus"])
 
@@ -17,6 +19,10 @@ def get_corpus_service() -> CorpusService:
     return CorpusService()
 
 
+def get_ingestion_service() -> IngestionJobService:
+    return container.get_ingestion_service()
+
+
 # Tuỳ chọn: vô hiệu hoá verify SSL trong môi trường DEV để tránh lỗi khi gọi
 # dịch vụ ngoài (LLM, loader, v.v.). Chỉ bật khi DEV_DISABLE_SSL_VERIFY=true
 if os.getenv("DEV_DISABLE_SSL_VERIFY", "false").lower() in {"1", "true", "yes"}:
@@ -25,19 +31,19 @@ if os.getenv("DEV_DISABLE_SSL_VERIFY", "false").lower() in {"1", "true", "yes"}:
     os.environ.setdefault("PYTHONHTTPSVERIFY", "0")
 
 
-@router.post("/upload", response_model=CorpusUploadResponse)
+@router.post("/upload", response_model=CorpusJobResponse)
 async def upload_document(
     file: UploadFile = File(...),
     title: str = Form(...),
     description: str = Form(None),
     source: str = Form(None),
     x_admin_token: str | None = Header(default=None, alias="X-Admin-Token"),
-    corpus_service: CorpusService = Depends(get_corpus_service),
+    ingestion_service: IngestionJobService = Depends(get_ingestion_service),
 ):
     """
-    Upload and process document.
+    Upload document và đưa vào hàng đợi ingest (trả job id ngay).
 
-    Steps:
+    Steps (chạy nền, theo dõi qua `/corpus/jobs/{job_id}`):
     1. Save file to storage
     2. Extract text content
     3. Detect chapters/sections
@@ -61,11 +67,11 @@ async def upload_document(
         if file.content_type not in allowed_types:
             raise HTTPException(status_code=415, detail="Chỉ hỗ trợ PDF, DOCX, TXT")
 
-        # Validate file size (10MB limit)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if file.size and file.size > max_size:
+        # Validate file size (UPLOAD_MAX_BYTES; spool cũng kiểm tra khi client không gửi size)
+        max_size_mb = UPLOAD_MAX_BYTES // (1024 * 1024)
+        if file.size and file.size > UPLOAD_MAX_BYTES:
             raise HTTPException(
-                status_code=413, detail="Kích thước tệp vượt quá giới hạn 10MB"
+                status_code=413, detail=f"Kích thước tệp vượt quá giới hạn {max_size_mb}MB"
             )
 
         # Title theo tên file (bỏ đè param title)
@@ -74,10 +80,16 @@ async def upload_document(
         print_info(
             f"/corpus/upload: title='{final_title}', source='{source}', content_type='{file.content_type}'"
         )
-        response = await corpus_service.upload_document(
-            file=file.file, title=final_title, description=description, source=source
-        )
-        return response
+        # Ghi file ra disk trong thread để không chặn event loop
+        try:
+            job = await asyncio.to_thread(
+                ingestion_service.submit, file.file, final_title, description, source
+            )
+        except UploadTooLargeError:
+            raise HTTPException(
+                status_code=413, detail=f"Kích thước tệp vượt quá giới hạn {max_size_mb}MB"
+            )
+        return job
     except HTTPException:
         raise
     except Exception as e:
@@ -85,6 +97,22 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+@router.get("/jobs/{job_id}", response_model=CorpusJobResponse)
+async def get_ingestion_job(
+    job_id: str,
+    x_admin_token: str | None = Header(default=None, alias="X-Admin-Token"),
+    ingestion_service: IngestionJobService = Depends(get_ingestion_service),
+):
+    """Trạng thái job ingest: stage hiện tại, tiến độ từng stage, kết quả/lỗi."""
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        print_warning("Unauthorized job status attempt: missing/invalid X-Admin-Token")
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    job = ingestion_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.delete("/delete", response_model=CorpusDeleteResponse)
 async def delete_document(
     document_id: int,
@@ -6,6 +6,7 @@ Handles document listing, details, and highlights.
 from fastapi import APIRouter, HTTPException, Depends, Query
 from app.services import DocumentService
 from app.schemas.common_types import ChunkSearchResponse, ChapterChunksResponse
+from app.schemas.common_types import ChunkSearchBatchRequest, ChunkSearchBatchResponse
 from app.schemas.common_types import (
     DocumentListResponse,
     DocumentDetailResponse,
@@ -64,6 +65,18 @@ async def search_chunks(
         raise HTTPException(status_code=500, detail=f'Failed to search: {str(e)}')
 
 
+@router.post('/search/batch', response_model=ChunkSearchBatchResponse)
+async def search_chunks_batch(
+    body: ChunkSearchBatchRequest,
+    doc_service: DocumentService = Depends(get_document_service),
+):
+    """Nhiều truy vấn semantic search trong một request (một round trip Qdrant); kết quả theo thứ tự `queries`."""
+    try:
+        return await doc_service.semantic_search_batch(body.queries)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Failed to search batch: {str(e)}')
+
+
 @router.get('/chunks', response_model=ChapterChunksResponse)
 async def get_chunks(
     chapter_id: int = Query(..., description='Chapter Id'),
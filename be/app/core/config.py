@@ -16,20 +16,65 @@ DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+# gRPC transport (ít overhead hơn HTTP khi Qdrant ở host xa); QDRANT_PORT vẫn dùng cho REST
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() in {"1", "true", "yes"}
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 # Collection được chuẩn hóa theo plan → 'hcm_chunks'
 QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "hcm_chunks")
 QDRANT_DISTANCE = os.getenv("QDRANT_DISTANCE", "Cosine")  # Cosine | Dot | Euclid
+# HNSW: m/ef_construct áp dụng cho collection (build index); QDRANT_HNSW_EF là ef lúc search (0 = mặc định Qdrant)
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+QDRANT_HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "0"))
+# Profile lưu trữ vector: none | scalar (int8, ~4x ít RAM) | binary (~32x, nên oversampling cao hơn)
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none").lower()
+QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "false").lower() in {"1", "true", "yes"}  # vector gốc trên đĩa, chỉ bản lượng tử hoá nằm RAM
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+QDRANT_RESCORE = os.getenv("QDRANT_RESCORE", "true").lower() in {"1", "true", "yes"}
+# Lưu chunk_text/chapter_title/document_title/page_number vào payload → chat dựng context không cần MySQL
+QDRANT_PAYLOAD_DENORMALIZED = os.getenv("QDRANT_PAYLOAD_DENORMALIZED", "false").lower() in {"1", "true", "yes"}
+
+# Vector engine: qdrant (mặc định) | local (index NumPy memory-mapped trong process)
+VECTOR_ENGINE = os.getenv("VECTOR_ENGINE", "qdrant").lower()
+# Khi Qdrant lỗi/không kết nối được → search trên index local nếu đã build
+VECTOR_LOCAL_FALLBACK = os.getenv("VECTOR_LOCAL_FALLBACK", "true").lower() in {"1", "true", "yes"}
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "storage/vector_index")
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32").lower()  # float32 | float16
 
 # Embedding configuration
 EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "text-embedding-004")
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))
+# Batch embedding khi ingest: số text mỗi request (Google tối đa 100) và số request song song
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_BATCH_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4"))
+# Cache embedding câu hỏi: LRU trong process + SQLite trên đĩa
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+EMBEDDING_CACHE_MAX_SIZE = int(os.getenv("EMBEDDING_CACHE_MAX_SIZE", "2048"))
+EMBEDDING_CACHE_DISK_MAX_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_SIZE", "100000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "storage/cache/embeddings.sqlite3")
 
 # RAG defaults
 RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
 # Giới hạn tối đa theo quyết định nghiệp vụ
 RAG_MAX_TOP_K = int(os.getenv("RAG_MAX_TOP_K", "10"))
+# Gộp các câu hỏi trùng nhau đang chạy đồng thời (chỉ khi phiên chưa có memory)
+RAG_COALESCE_ENABLED = os.getenv("RAG_COALESCE_ENABLED", "true").lower() in {"1", "true", "yes"}
+# MMR: lấy pool ứng viên lớn hơn rồi chọn RAG_TOP_K vừa liên quan vừa đa dạng (λ=1 → chỉ theo score)
+RAG_MMR_ENABLED = os.getenv("RAG_MMR_ENABLED", "true").lower() in {"1", "true", "yes"}
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))
+RAG_MMR_POOL_SIZE = int(os.getenv("RAG_MMR_POOL_SIZE", "20"))
+# Hybrid: trộn BM25 (lexical, bỏ dấu) với vector search bằng reciprocal rank fusion 1/(k + rank)
+RAG_HYBRID_ENABLED = os.getenv("RAG_HYBRID_ENABLED", "true").lower() in {"1", "true", "yes"}
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "storage/bm25/index.pkl")
+
+# Semantic answer cache: trả lại ChatResponse khi câu hỏi mới đủ giống câu đã trả lời (không có memory phiên)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in {"1", "true", "yes"}
+ANSWER_CACHE_MAX_SIZE = int(os.getenv("ANSWER_CACHE_MAX_SIZE", "512"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97"))  # cosine
 
 # LLM config
 LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "gemini-2.5-flash")
@@ -38,8 +83,25 @@ LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "gemini-2.5-flash")
 MEMORY_TTL_SECONDS = int(os.getenv("MEMORY_TTL_SECONDS", "3600"))  # 1 giờ
 MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "10"))
 
+# Ngân sách token (ước lượng) cho prompt: context chunk và memory hội thoại
+RAG_CONTEXT_MAX_TOKENS = int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "3000"))
+RAG_MEMORY_MAX_TOKENS = int(os.getenv("RAG_MEMORY_MAX_TOKENS", "800"))
+
 # Storage
 STORAGE_DIR = os.getenv("STORAGE_DIR", "storage/documents")
+# Giới hạn kích thước upload; file được spool ra đĩa và ingest theo luồng nên không cần nạp cả file vào RAM
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Ingestion jobs (worker pool chạy nền cho /corpus/upload)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", "86400"))  # giữ trạng thái job 1 ngày
+# Pipeline ingest: số chunk mỗi batch và độ sâu queue giữa các stage (giới hạn bộ nhớ)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", str(EMBEDDING_BATCH_SIZE * EMBEDDING_BATCH_CONCURRENCY)))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "2"))
+# Tách PDF song song theo dải trang (process pool dùng chung của IngestionJobService); PDF ít trang hơn ngưỡng chạy trong process chính.
+# Đo (pymupdf4llm): ~0.12s/trang; pool đã khởi động không tốn thêm, spawn worker lần đầu ~0.5s ≈ 4 trang → ngưỡng 16 (dư ~4 lần, mỗi dải ≥ 1 trang với 4 worker × 4 dải)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
 
 # Admin
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "11minhan")
@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, text
 from sqlmodel import SQLModel, create_engine, Session
 
 from app.core.config import DATABASE_URL
@@ -19,6 +20,31 @@ engine = create_engine(
 def create_db_and_tables():
     """Create database tables from SQLModel models"""
     SQLModel.metadata.create_all(engine)
+    ensure_columns()
+
+
+def ensure_columns():
+    """Thêm cột nullable mới của model vào bảng đã có (create_all không ALTER bảng cũ)."""
+    # Import trong hàm: app.utils (stats) import ngược engine từ module này
+    from app.utils.color import print_info
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {col_type}'))
+                for index in table.indexes:
+                    if list(index.columns) == [column]:
+                        index.create(conn)
+                print_info(f'Added column {table.name}.{column.name}')
 
 
 def get_session():
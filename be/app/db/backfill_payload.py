@@ -0,0 +1,64 @@
+"""
+Backfill payload denormalized (chunk_text, chapter_title, document_title, page_number)
+cho các point Qdrant đã có, để bật QDRANT_PAYLOAD_DENORMALIZED mà không cần upload lại.
+
+Chạy: python -m app.db.backfill_payload [--batch-size 256]
+"""
+
+import argparse
+
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.models import Chunk, Chapter
+from app.services.vector import QdrantVectorService, denormalized_payload
+from app.utils.color import print_info, print_success, print_error
+
+
+def backfill_payload(batch_size: int = 256) -> int:
+    """Merge payload denormalized theo batch chunk id tăng dần; trả số point đã cập nhật."""
+    vector_service = QdrantVectorService()
+    updated = 0
+    last_id = 0
+    with Session(engine) as session:
+        while True:
+            chunks = session.exec(
+                select(Chunk)
+                .where(Chunk.id > last_id)
+                .order_by(Chunk.id)
+                .limit(batch_size)
+                .options(
+                    selectinload(Chunk.chapter).selectinload(Chapter.document),
+                    selectinload(Chunk.quotes),
+                )
+            ).all()
+            if not chunks:
+                break
+            payloads = {}
+            for c in chunks:
+                page_number = c.quotes[0].page_number if c.quotes else None
+                payloads[int(c.id)] = denormalized_payload(
+                    c.chunk_text,
+                    c.chapter.title,
+                    c.chapter.document.title,
+                    page_number,
+                )
+            try:
+                vector_service.set_payloads(payloads)
+            except Exception as e:
+                print_error(f'[backfill_payload] batch after id={last_id} failed: {e}')
+                raise
+            updated += len(payloads)
+            last_id = int(chunks[-1].id)
+            session.expunge_all()
+            print_info(f'[backfill_payload] updated {updated} points (last id={last_id})')
+    print_success(f'[backfill_payload] done: {updated} points')
+    return updated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill denormalized Qdrant payloads from MySQL')
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args()
+    backfill_payload(batch_size=args.batch_size)
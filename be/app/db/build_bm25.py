@@ -0,0 +1,34 @@
+"""
+Build lại BM25 index (nhánh lexical của hybrid search) từ bảng chunks trong MySQL.
+Upload/xoá tài liệu cập nhật index tăng dần; lệnh này dùng cho lần đầu bật RAG_HYBRID_ENABLED
+hoặc khi file index mất/hỏng. App đang chạy tự nạp lại file mới.
+
+Chạy: python -m app.db.build_bm25 [--out storage/bm25/index.pkl] [--batch-size 1000]
+"""
+
+import argparse
+import time
+
+from app.core.config import BM25_INDEX_PATH
+from app.db.reindex import iter_chunk_rows
+from app.utils.bm25 import BM25Index
+from app.utils.color import print_info, print_success
+
+
+def build_bm25(path: str = BM25_INDEX_PATH, batch_size: int = 1000) -> int:
+    started = time.time()
+    index = BM25Index()
+    for items in iter_chunk_rows(batch_size):
+        index.add_many((it['id'], it['text']) for it in items)
+        print_info(f'[build_bm25] indexed {len(index)} chunks')
+    index.save(path)
+    print_success(f'[build_bm25] {len(index)} chunks → {path} in {time.time() - started:.1f}s')
+    return len(index)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the BM25 lexical index from MySQL chunks')
+    parser.add_argument('--out', default=BM25_INDEX_PATH)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    build_bm25(path=args.out, batch_size=args.batch_size)
@@ -0,0 +1,96 @@
+"""
+Build index vector local (NumPy .npy memory-mapped) cho LocalVectorService.
+Mặc định copy vector từ Qdrant (không gọi embedding API); --source mysql embed lại từ bảng chunks
+(dùng khi chạy VECTOR_ENGINE=local không có Qdrant). Chạy lại sau khi upload để cập nhật; service tự nạp lại.
+
+Chạy: python -m app.db.build_local_index [--source qdrant|mysql] [--dtype float16] [--out storage/vector_index]
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from app.core.config import LOCAL_INDEX_DIR, LOCAL_INDEX_DTYPE, EMBEDDING_DIM, EMBEDDING_MODEL_ID, INGEST_BATCH_SIZE
+from app.db.reindex import iter_chunk_rows
+from app.services.local_vector import write_local_index
+from app.services.vector import QdrantVectorService
+from app.utils.embedding import get_embedding_provider
+from app.utils.color import print_info, print_success, print_warning
+
+
+def _from_qdrant(batch_size: int):
+    vector_service = QdrantVectorService()
+    ids: List[int] = []
+    vectors: List[List[float]] = []
+    document_ids: List[int] = []
+    chapter_ids: List[int] = []
+    offset = None
+    while True:
+        points, offset = vector_service.client.scroll(
+            collection_name=vector_service.collection,
+            limit=batch_size,
+            offset=offset,
+            with_payload=['document_id', 'chapter_id'],
+            with_vectors=True,
+        )
+        for p in points:
+            payload = p.payload or {}
+            ids.append(int(p.id))
+            vectors.append(list(p.vector))
+            document_ids.append(int(payload.get('document_id', 0)))
+            chapter_ids.append(int(payload.get('chapter_id', 0)))
+        print_info(f'[build_local_index] read {len(ids)} points from Qdrant')
+        if offset is None:
+            return ids, vectors, document_ids, chapter_ids
+
+
+def _from_mysql(batch_size: int):
+    embedding_provider = get_embedding_provider()
+    ids: List[int] = []
+    vectors: List[List[float]] = []
+    document_ids: List[int] = []
+    chapter_ids: List[int] = []
+    for items in iter_chunk_rows(batch_size):
+        vectors.extend(embedding_provider.embed_texts([it['text'] for it in items]))
+        for it in items:
+            ids.append(it['id'])
+            document_ids.append(it['payload']['document_id'])
+            chapter_ids.append(it['payload']['chapter_id'])
+        print_info(f'[build_local_index] embedded {len(ids)} chunks')
+    return ids, vectors, document_ids, chapter_ids
+
+
+def build_local_index(
+    source: str = 'qdrant',
+    index_dir: str = LOCAL_INDEX_DIR,
+    dtype: str = LOCAL_INDEX_DTYPE,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> int:
+    started = time.time()
+    ids, vectors, document_ids, chapter_ids = (_from_mysql if source == 'mysql' else _from_qdrant)(batch_size)
+    if not ids:
+        # Vẫn ghi index rỗng để thay index cũ (có thể chứa chunk đã xoá); service coi index rỗng là không dùng được
+        print_warning(f'[build_local_index] no vectors found in {source}, writing an empty index')
+    write_local_index(
+        np.asarray(ids, dtype=np.int64),
+        np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1 if ids else EMBEDDING_DIM),
+        np.asarray(document_ids, dtype=np.int64),
+        np.asarray(chapter_ids, dtype=np.int64),
+        index_dir=index_dir,
+        dtype=dtype,
+        meta={'source': source, 'model_id': EMBEDDING_MODEL_ID},
+    )
+    print_success(f'[build_local_index] {len(ids)} vectors ({dtype}) → {index_dir} in {time.time() - started:.1f}s')
+    return len(ids)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the memory-mapped local vector index')
+    parser.add_argument('--source', choices=['qdrant', 'mysql'], default='qdrant')
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default=LOCAL_INDEX_DTYPE)
+    parser.add_argument('--out', default=LOCAL_INDEX_DIR)
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+    build_local_index(source=args.source, index_dir=args.out, dtype=args.dtype, batch_size=args.batch_size)
@@ -0,0 +1,122 @@
+"""
+Chuyển collection Qdrant hiện có sang storage profile mới (quantization/on_disk) tại chỗ.
+Qdrant build lại segment ở nền nên chat vẫn search được trong lúc migrate.
+
+Chạy: python -m app.db.migrate_collection [--quantization scalar] [--on-disk] [--wait] [--check-recall 200] [--questions q.txt]
+"""
+
+import argparse
+import time
+from typing import List, Optional
+
+from qdrant_client.models import QueryRequest, SearchParams
+
+from app.core.config import QDRANT_QUANTIZATION, QDRANT_ON_DISK
+from app.services.vector import QdrantVectorService, search_params
+from app.utils.embedding import get_embedding_provider
+from app.utils.color import print_info, print_success, print_warning, print_error
+
+
+def describe_collection(vector_service: QdrantVectorService) -> None:
+    info = vector_service.client.get_collection(vector_service.resolve_collection())
+    params = info.config.params.vectors
+    print_info(
+        f'[migrate_collection] {vector_service.collection}: status={info.status} points={info.points_count} '
+        f'on_disk={getattr(params, "on_disk", None)} quantization={info.config.quantization_config}'
+    )
+
+
+def wait_until_green(vector_service: QdrantVectorService, timeout: float = 3600.0) -> bool:
+    """Chờ optimizer build xong segment mới (status green)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = str(vector_service.client.get_collection(vector_service.resolve_collection()).status).lower()
+        if status.endswith('green'):
+            return True
+        time.sleep(2.0)
+    return False
+
+
+def measure_recall(
+    vector_service: QdrantVectorService,
+    sample_size: int = 200,
+    top_k: int = 5,
+    profile: Optional[str] = None,
+    questions: Optional[List[str]] = None,
+) -> Optional[float]:
+    """recall@k của search thường (quantized + rescore) so với exact search.
+
+    Có `questions` → embed làm query held-out; không thì lấy mẫu vector có sẵn và bỏ chính điểm đó
+    khỏi cả hai tập kết quả (nếu không, query luôn tự khớp chính nó và recall bị thổi phồng).
+    """
+    if questions:
+        vectors: List[List[float]] = get_embedding_provider().embed_texts(questions[:sample_size])
+        self_ids: List[Optional[int]] = [None] * len(vectors)
+    else:
+        points, _ = vector_service.client.scroll(
+            collection_name=vector_service.collection,
+            limit=sample_size,
+            with_vectors=True,
+            with_payload=False,
+        )
+        points = [p for p in points if p.vector is not None]
+        vectors = [list(p.vector) for p in points]
+        self_ids = [int(p.id) for p in points]
+    if not vectors:
+        print_warning('[migrate_collection] không có query để đo recall, bỏ qua')
+        return None
+
+    def run(params: Optional[SearchParams]) -> List[set]:
+        # Lấy dư một kết quả để vẫn đủ top_k sau khi bỏ chính query
+        requests = [QueryRequest(query=v, limit=top_k + 1, params=params) for v in vectors]
+        responses = vector_service.client.query_batch_points(
+            collection_name=vector_service.collection, requests=requests
+        )
+        return [
+            set([int(p.id) for p in r.points if int(p.id) != self_id][:top_k]) for r, self_id in zip(responses, self_ids)
+        ]
+
+    exact = run(SearchParams(exact=True))
+    approx = run(search_params(profile))
+    recall = sum(len(a & e) / max(1, len(e)) for a, e in zip(approx, exact)) / len(vectors)
+    source = 'held-out questions' if questions else 'stored vectors, self excluded'
+    print_info(f'[migrate_collection] recall@{top_k} = {recall:.4f} ({len(vectors)} queries, {source})')
+    return recall
+
+
+def migrate_collection(
+    quantization: str = QDRANT_QUANTIZATION,
+    on_disk: bool = QDRANT_ON_DISK,
+    wait: bool = False,
+    check_recall: int = 0,
+    questions_file: Optional[str] = None,
+) -> None:
+    vector_service = QdrantVectorService()
+    describe_collection(vector_service)
+    print_info(f'[migrate_collection] applying quantization={quantization} on_disk={on_disk}…')
+    try:
+        vector_service.apply_storage_profile(quantization, on_disk)
+    except Exception as e:
+        print_error(f'[migrate_collection] update_collection failed: {e}')
+        raise
+    if wait and not wait_until_green(vector_service):
+        print_warning('[migrate_collection] optimizer chưa xong, kiểm tra lại sau')
+    describe_collection(vector_service)
+    if check_recall > 0:
+        questions = None
+        if questions_file:
+            with open(questions_file, encoding='utf-8') as f:
+                questions = [line.strip() for line in f if line.strip()]
+        measure_recall(vector_service, sample_size=check_recall, profile=quantization, questions=questions)
+    print_success('[migrate_collection] done')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate Qdrant collection to the configured storage profile')
+    parser.add_argument('--quantization', choices=['none', 'scalar', 'binary'], default=QDRANT_QUANTIZATION)
+    parser.add_argument('--on-disk', action=argparse.BooleanOptionalAction, default=QDRANT_ON_DISK)
+    parser.add_argument('--wait', action='store_true', help='Chờ collection về trạng thái green')
+    parser.add_argument('--check-recall', type=int, default=0, help='Số query mẫu để đo recall@5 so với exact search')
+    parser.add_argument('--questions', default=None, help='File câu hỏi thật (mỗi dòng một câu) làm query held-out cho --check-recall')
+    args = parser.parse_args()
+    migrate_collection(args.quantization, args.on_disk, args.wait, args.check_recall, args.questions)
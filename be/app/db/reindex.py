@@ -0,0 +1,298 @@
+"""
+Reindex blue/green: embed lại toàn bộ Chunk từ MySQL vào collection mới <alias>__<model tag>__v<time>,
+kiểm tra số lượng rồi chuyển alias QDRANT_COLLECTION sang collection mới trong một thao tác.
+Chat vẫn đọc qua alias cũ suốt quá trình. Dùng khi đổi EMBEDDING_MODEL_ID/EMBEDDING_DIM/storage profile;
+đổi tham số chunking cần upload lại tài liệu (chunk nằm trong MySQL).
+
+Đổi model phải chạy hai pha (API process embed câu hỏi bằng model của nó):
+  1. --no-switch (env model mới): build collection mới, alias giữ nguyên.
+  2. Restart mọi API process với model mới: process thấy alias lệch model → dùng thẳng collection mới.
+  3. --switch-only: bù thay đổi trong lúc chờ, đổi alias, xoá collection cũ.
+
+Chạy: python -m app.db.reindex [--batch-size 256] [--keep-old] [--drop-legacy] [--no-switch | --switch-only] [--force]
+"""
+
+import argparse
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from qdrant_client.models import (
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+)
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from app.core.config import QDRANT_COLLECTION, INGEST_BATCH_SIZE, INGEST_QUEUE_SIZE
+from app.core.database import engine
+from app.models import Chunk, Chapter
+from app.services.vector import (
+    EmbeddingModelMismatchError,
+    QdrantVectorService,
+    check_embedding_model,
+    chunk_payload,
+    collection_model_tag,
+    get_qdrant_client,
+    latest_model_collection,
+    model_tag,
+    versioned_collection_name,
+)
+from app.utils.chunking import chunk_text_hash
+from app.utils.embedding import get_embedding_provider
+from app.utils.pipeline import run_pipeline
+from app.utils.color import print_info, print_success, print_warning, print_error
+
+
+def iter_chunk_rows(batch_size: int, ids: Optional[List[int]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Đọc Chunk theo keyset (id tăng dần) kèm dữ liệu payload; `ids` giới hạn tập cần đọc (catch-up)."""
+    last_id = 0
+    with Session(engine) as session:
+        while True:
+            statement = select(Chunk).where(Chunk.id > last_id)
+            if ids is not None:
+                statement = statement.where(Chunk.id.in_(ids))
+            chunks = session.exec(
+                statement.order_by(Chunk.id)
+                .limit(batch_size)
+                .options(
+                    selectinload(Chunk.chapter).selectinload(Chapter.document),
+                    selectinload(Chunk.quotes),
+                )
+            ).all()
+            if not chunks:
+                return
+            yield [
+                {
+                    'id': int(c.id),
+                    'text': c.chunk_text,
+                    'payload': chunk_payload(
+                        document_id=c.chapter.document_id,
+                        chapter_id=c.chapter_id,
+                        chunk_id=c.id,
+                        chunk_index=c.chunk_index,
+                        created_at=c.created_at,
+                        chunk_text=c.chunk_text,
+                        chapter_title=c.chapter.title,
+                        document_title=c.chapter.document.title,
+                        page_number=c.quotes[0].page_number if c.quotes else None,
+                    ),
+                }
+                for c in chunks
+            ]
+            last_id = int(chunks[-1].id)
+            session.expunge_all()
+
+
+def _collection_ids(vector_service: QdrantVectorService) -> Set[int]:
+    ids: Set[int] = set()
+    offset = None
+    while True:
+        points, offset = vector_service.client.scroll(
+            collection_name=vector_service.collection,
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        ids.update(int(p.id) for p in points)
+        if offset is None:
+            return ids
+
+
+def _copy_chunks(target: QdrantVectorService, batch_size: int, ids: Optional[List[int]] = None) -> int:
+    """Đọc SQL ‖ embed ‖ upsert chồng lấn (cùng pipeline với ingest); trả số point đã ghi."""
+    embedding_provider = get_embedding_provider()
+    done = {'upsert': 0}
+
+    def embed_stage(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        vectors = embedding_provider.embed_texts([it['text'] for it in items])
+        for it, vec in zip(items, vectors):
+            it['vector'] = vec
+        return items
+
+    def upsert_stage(items: List[Dict[str, Any]]) -> None:
+        target.upsert_points(
+            ids=[it['id'] for it in items],
+            vectors=[it['vector'] for it in items],
+            payloads=[it['payload'] for it in items],
+        )
+        done['upsert'] += len(items)
+        print_info(f'[reindex] upserted {done["upsert"]} points')
+
+    run_pipeline(
+        iter_chunk_rows(batch_size, ids=ids),
+        [('embed', embed_stage), ('upsert', upsert_stage)],
+        maxsize=INGEST_QUEUE_SIZE,
+    )
+    return done['upsert']
+
+
+def _text_changed(current: Dict[str, Any], expected: Dict[str, Any]) -> bool:
+    # chunk_text chỉ có trong payload khi bật QDRANT_PAYLOAD_DENORMALIZED
+    if 'chunk_text' not in current or 'chunk_text' not in expected:
+        return False
+    return chunk_text_hash(current['chunk_text']) != chunk_text_hash(expected['chunk_text'])
+
+
+def _reconcile(target: QdrantVectorService, batch_size: int) -> bool:
+    """Bù thay đổi trong lúc reindex (upload/backfill vẫn ghi vào collection cũ); True nếu khớp số lượng.
+
+    Chunk mới hoặc đổi nội dung → embed lại; payload lệch MySQL (đổi tiêu đề, trang, vị trí chunk) → set_payload;
+    chunk đã xoá → xoá point.
+    """
+    db_ids: Set[int] = set()
+    missing: List[int] = []
+    stale: Dict[int, Dict[str, Any]] = {}
+    for items in iter_chunk_rows(batch_size):
+        ids = [it['id'] for it in items]
+        db_ids.update(ids)
+        current = {
+            int(p.id): p.payload or {}
+            for p in target.client.retrieve(
+                collection_name=target.collection, ids=ids, with_payload=True, with_vectors=False
+            )
+        }
+        for it in items:
+            have = current.get(it['id'])
+            if have is None or _text_changed(have, it['payload']):
+                missing.append(it['id'])
+            elif have != it['payload']:
+                stale[it['id']] = it['payload']
+    extra = sorted(_collection_ids(target) - db_ids)
+    if missing:
+        print_info(f'[reindex] catch-up {len(missing)} new/changed chunks')
+        _copy_chunks(target, batch_size, ids=missing)
+    if stale:
+        print_info(f'[reindex] refreshing {len(stale)} payloads')
+        target.set_payloads(stale)
+    if extra:
+        print_info(f'[reindex] removing {len(extra)} deleted chunks')
+        target.delete_points_by_ids(extra)
+    count = target.client.count(collection_name=target.collection, exact=True).count
+    print_info(f'[reindex] verify: mysql={len(db_ids)} qdrant={count}')
+    return count == len(db_ids)
+
+
+def switch_alias(client, alias: str, new_collection: str) -> Optional[str]:
+    """Trỏ alias sang collection mới trong một request (atomic); trả collection cũ nếu có."""
+    old_collection = None
+    for a in client.get_aliases().aliases:
+        if a.alias_name == alias:
+            old_collection = a.collection_name
+    operations: List[Any] = []
+    if old_collection is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    operations.append(
+        CreateAliasOperation(create_alias=CreateAlias(collection_name=new_collection, alias_name=alias))
+    )
+    client.update_collection_aliases(change_aliases_operations=operations)
+    return old_collection
+
+
+def _model_changed(client, collection_name: str) -> bool:
+    try:
+        check_embedding_model(client, collection_name)
+    except EmbeddingModelMismatchError as e:
+        print_warning(f'[reindex] {e}')
+        return True
+    if collection_model_tag(collection_name) is None:
+        print_warning(f'[reindex] {collection_name} has no model tag; assuming it was built with {model_tag()}')
+    return False
+
+
+def reindex(
+    batch_size: int = INGEST_BATCH_SIZE,
+    keep_old: bool = False,
+    drop_legacy: bool = False,
+    no_switch: bool = False,
+    switch_only: bool = False,
+    force: bool = False,
+) -> str:
+    alias = QDRANT_COLLECTION
+    client = get_qdrant_client()
+    aliases = {a.alias_name: a.collection_name for a in client.get_aliases().aliases}
+    is_alias = alias in aliases
+    legacy = not is_alias and client.collection_exists(alias)
+    if legacy and not drop_legacy and not no_switch:
+        # Alias không được trùng tên collection thật → lần đầu phải xoá collection cũ (gián đoạn ngắn khi đổi)
+        raise SystemExit(
+            f'"{alias}" là collection thật, chưa phải alias. Chạy lại với --drop-legacy để thay bằng alias '
+            '(collection cũ bị xoá ngay trước khi tạo alias).'
+        )
+    live_target = aliases.get(alias) or (alias if legacy else None)
+
+    started = time.time()
+    if switch_only:
+        new_collection = latest_model_collection(client, alias)
+        if new_collection is None:
+            raise SystemExit(f'Chưa có collection nào cho model {model_tag()}; chạy --no-switch trước.')
+        target = QdrantVectorService(client=client, collection=new_collection)
+        print_info(f'[reindex] switch-only: catching up {new_collection}…')
+        if not _reconcile(target, batch_size):
+            raise RuntimeError('point count mismatch after catch-up; alias untouched')
+    else:
+        if live_target and not no_switch and not force and _model_changed(client, live_target):
+            # API đang chạy vẫn embed câu hỏi bằng model cũ → đổi alias lúc này làm hỏng search
+            raise SystemExit(
+                'EMBEDDING_MODEL_ID/EMBEDDING_DIM khác collection đang phục vụ. Chạy hai pha: '
+                '--no-switch → khởi động lại mọi API process với model mới → --switch-only.'
+            )
+        new_collection = base = versioned_collection_name(alias, time.strftime('%Y%m%d%H%M%S'))
+        suffix = 1
+        while client.collection_exists(new_collection):
+            suffix += 1
+            new_collection = f'{base}_{suffix}'
+        target = QdrantVectorService(client=client, collection=new_collection)
+        print_info(f'[reindex] building {new_collection} (alias {alias} vẫn phục vụ chat)…')
+        target.create_collection(new_collection)
+        try:
+            total = _copy_chunks(target, batch_size)
+            print_info(f'[reindex] bulk copy {total} chunks in {time.time() - started:.1f}s')
+            if not _reconcile(target, batch_size):
+                raise RuntimeError('point count mismatch after catch-up')
+        except BaseException as e:
+            print_error(f'[reindex] failed, alias untouched; dropping {new_collection}: {e}')
+            client.delete_collection(new_collection)
+            raise
+        if no_switch:
+            print_success(
+                f'[reindex] built {new_collection}; alias {alias} unchanged. API process chạy model {model_tag()} '
+                'tự dùng collection này; restart xong mọi process thì chạy --switch-only.'
+            )
+            return new_collection
+
+    if legacy:
+        print_warning(f'[reindex] dropping legacy collection {alias} to free the alias name')
+        client.delete_collection(alias)
+    old_collection = switch_alias(client, alias, new_collection)
+    print_success(f'[reindex] alias {alias} → {new_collection}')
+
+    # Upload/xoá giữa lúc verify và lúc đổi alias đã ghi vào collection cũ → bù lần cuối
+    _reconcile(target, batch_size)
+    if old_collection and old_collection != new_collection and not keep_old:
+        client.delete_collection(old_collection)
+        print_info(f'[reindex] dropped old collection {old_collection}')
+    print_success(f'[reindex] done in {time.time() - started:.1f}s')
+    return new_collection
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Blue/green reindex of all chunks into a new Qdrant collection')
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument('--keep-old', action='store_true', help='Giữ collection cũ sau khi đổi alias (để rollback)')
+    parser.add_argument('--drop-legacy', action='store_true', help='Cho phép xoá collection thật trùng tên alias')
+    phase = parser.add_mutually_exclusive_group()
+    phase.add_argument('--no-switch', action='store_true', help='Pha 1: build collection cho model mới, không đổi alias')
+    phase.add_argument('--switch-only', action='store_true', help='Pha 2: bù thay đổi rồi đổi alias sang collection đã build')
+    parser.add_argument('--force', action='store_true', help='Đổi alias ngay cả khi model khác collection đang phục vụ')
+    args = parser.parse_args()
+    reindex(
+        batch_size=args.batch_size,
+        keep_old=args.keep_old,
+        drop_legacy=args.drop_legacy,
+        no_switch=args.no_switch,
+        switch_only=args.switch_only,
+        force=args.force,
+    )
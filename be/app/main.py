@@ -13,7 +13,7 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.core.database import create_db_and_tables
 from app.api import api_router
 from app.utils import print_info, print_success, print_error
-from app.services import QdrantVectorService
+from app.services import container
 
 
 @asynccontextmanager
@@ -30,17 +30,18 @@ async def lifespan(app: FastAPI):
         print_error(f"❌ Database initialization failed: {e}")
         # Don't crash the app, continue without database
 
-    # Ensure Qdrant collection
+    # Build shared services once (Qdrant client, embeddings, LangGraph agent)
     try:
-        QdrantVectorService().ensure_collection()
-        print_success("✅ Qdrant collection ready")
+        container.startup()
+        print_success("✅ Shared services ready")
     except Exception as e:
-        print_error(f"⚠️ Qdrant not ready: {e}")
+        print_error(f"⚠️ Shared services not ready: {e}")
 
     yield
 
     # Shutdown
     print_info("🛑 Shutting down HCM Thoughts RAG API...")
+    await container.shutdown()
 
 
 # Create FastAPI app
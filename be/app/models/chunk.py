@@ -17,6 +17,8 @@ class ChunkBase(SQLModel):
     chunk_index: int = Field(index=True)
     qdrant_point_id: Optional[str] = Field(default=None, max_length=128, index=True)
     chunk_text: str = Field(index=False)  # LONGTEXT in MySQL
+    # md5 của chunk_text đã chuẩn hoá; so khớp chunk không đổi khi upload lại tài liệu
+    text_hash: Optional[str] = Field(default=None, max_length=64)
 
 
 class Chunk(ChunkBase, table=True):
@@ -30,7 +32,8 @@ class Chunk(ChunkBase, table=True):
 
     # Relationships
     chapter: 'Chapter' = Relationship(back_populates='chunks')
-    quotes: List['Quote'] = Relationship(back_populates='chunk')
+    # Theo thứ tự ghi (trang tăng dần) → quotes[0] là trang đầu của chunk
+    quotes: List['Quote'] = Relationship(back_populates='chunk', sa_relationship_kwargs={'order_by': 'Quote.id'})
 
 
 class QuoteBase(SQLModel):
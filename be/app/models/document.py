@@ -18,6 +18,8 @@ class DocumentBase(SQLModel):
     description: Optional[str] = None
     file_path: Optional[str] = Field(default=None, max_length=500)
     source: Optional[str] = Field(default=None, max_length=255)
+    # md5 của file gốc; chỉ gán khi ingest xong → upload lại cùng bytes thì bỏ qua pipeline
+    content_hash: Optional[str] = Field(default=None, max_length=64, index=True)
 
 
 class Document(DocumentBase, table=True):
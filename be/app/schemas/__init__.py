@@ -28,6 +28,8 @@ __all__ = [
     'CategoriesResponse',
     'CorpusUploadResponse',
     'CorpusDeleteResponse',
+    'CorpusJobStage',
+    'CorpusJobResponse',
     'SpecialAnalysisResponse',
     'FeaturedItem',
     'FeaturedResponse',
@@ -78,6 +78,27 @@ class ChunkSearchResponse(BaseModel):
     pagination: PaginationResponse
 
 
+class ChunkSearchQuery(BaseModel):
+    """Một truy vấn trong /docs/search/batch"""
+
+    q: str = Field(..., min_length=1, max_length=1000)
+    doc_id: Optional[int] = None
+    chapter_id: Optional[int] = None
+    limit: int = Field(default=10, ge=1, le=50)
+
+
+class ChunkSearchBatchRequest(BaseModel):
+    """Nhiều truy vấn semantic search gửi một lần"""
+
+    queries: List[ChunkSearchQuery] = Field(..., min_length=1, max_length=20)
+
+
+class ChunkSearchBatchResponse(BaseModel):
+    """Kết quả theo đúng thứ tự `queries`"""
+
+    results: List[ChunkSearchResponse]
+
+
 class ChapterChunksResponse(BaseModel):
     """Danh sách chunks theo chapter có phân trang"""
 
@@ -105,6 +126,9 @@ class ChatDebugInfo(BaseModel):
     retrieved_chunks: List[int]
     query_time_ms: Optional[float] = None
     vector_search_time_ms: Optional[float] = None
+    answer_cache_hit: Optional[bool] = None
+    context_tokens: Optional[int] = None  # ước lượng token của context chunk
+    prompt_tokens: Optional[int] = None  # ước lượng token của toàn bộ prompt
 
 
 class ChatResponse(BaseModel):
@@ -254,6 +278,31 @@ class CorpusDeleteResponse(ApiResponse):
     deleted_document_id: int
 
 
+class CorpusJobStage(BaseModel):
+    """Tiến độ một stage ingest"""
+
+    name: str
+    status: Literal['pending', 'running', 'done', 'failed'] = 'pending'
+    done: int = 0
+    total: Optional[int] = None
+    elapsed_seconds: Optional[float] = None
+    items_per_second: Optional[float] = None
+
+
+class CorpusJobResponse(ApiResponse):
+    """Trạng thái job ingest (/corpus/upload, /corpus/jobs/{job_id})"""
+
+    job_id: str
+    title: str
+    state: Literal['queued', 'running', 'done', 'failed'] = 'queued'
+    stage: Optional[str] = None
+    stages: List[CorpusJobStage] = []
+    result: Optional[CorpusUploadResponse] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+
+
 # Static content
 class SpecialAnalysisResponse(BaseModel):
     """Special analysis content response"""
@@ -293,4 +342,6 @@ class StatsResponse(BaseModel):
     total_articles: int
     total_chunks: Optional[int] = None
     total_reports: Optional[int] = None
+    embedding_cache: Optional[Dict[str, int]] = None
+    answer_cache: Optional[Dict[str, int]] = None
     last_updated: datetime = Field(default_factory=datetime.now)
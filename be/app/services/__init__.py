@@ -9,6 +9,9 @@ from .article import ArticleService
 from .corpus import CorpusService
 from .report import ReportService
 from .vector import QdrantVectorService
+from .local_vector import LocalVectorService
+from .ingestion import IngestionJobService
+from .container import ServiceContainer, container
 
 __all__ = [
     'RAGService',
@@ -17,4 +20,8 @@ __all__ = [
     'CorpusService',
     'ReportService',
     'QdrantVectorService',
+    'LocalVectorService',
+    'IngestionJobService',
+    'ServiceContainer',
+    'container',
 ]
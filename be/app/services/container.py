@@ -0,0 +1,125 @@
+"""
+Application-scoped service container.
+Builds heavy services once (in `lifespan`) and hands out shared instances.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+from app.utils.embedding import get_embedding_provider
+from app.services.vector import QdrantVectorService, AsyncQdrantVectorService, close_qdrant_clients
+from app.services.local_vector import LocalVectorService, VectorSearchRouter
+from app.core.config import VECTOR_ENGINE
+from app.services.rag import RAGService
+from app.services.ingestion import IngestionJobService
+from app.utils.color import print_info, print_success, print_error
+
+
+class ServiceContainer:
+    """Giữ embedding provider, Qdrant service (sync + async), RAGService và ingestion worker pool dùng chung."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.embedding_provider = None
+        self.vector_service: Optional[QdrantVectorService] = None
+        self.async_vector_service: Optional[VectorSearchRouter] = None
+        self.rag_service: Optional[RAGService] = None
+        self.ingestion_service: Optional[IngestionJobService] = None
+
+    def startup(self) -> None:
+        """Build tất cả service một lần; gọi từ lifespan."""
+        with self._lock:
+            self._build()
+
+    async def shutdown(self) -> None:
+        """Giải phóng client dùng chung khi tắt app."""
+        with self._lock:
+            if self.ingestion_service is not None:
+                self.ingestion_service.shutdown()
+            self.embedding_provider = None
+            self.vector_service = None
+            self.async_vector_service = None
+            self.rag_service = None
+            self.ingestion_service = None
+        try:
+            await close_qdrant_clients()
+        except Exception as e:
+            print_error(f'[ServiceContainer] close Qdrant clients failed: {e}')
+
+    def get_vector_service(self) -> QdrantVectorService:
+        if self.vector_service is None:
+            with self._lock:
+                if self.vector_service is None:
+                    self._build_vector_service()
+        return self.vector_service
+
+    def get_async_vector_service(self) -> VectorSearchRouter:
+        """Search async cho request path (RAG/semantic search): Qdrant hoặc index local theo VECTOR_ENGINE."""
+        if self.async_vector_service is None:
+            with self._lock:
+                if self.async_vector_service is None:
+                    self._build_search_router()
+        return self.async_vector_service
+
+    def _build_search_router(self) -> None:
+        # Caller giữ self._lock
+        local = LocalVectorService()
+        if not local.available:
+            print_info('[ServiceContainer] Local vector index not built (python -m app.db.build_local_index)')
+        primary = AsyncQdrantVectorService() if VECTOR_ENGINE != 'local' else None
+        self.async_vector_service = VectorSearchRouter(primary=primary, local=local)
+
+    def get_embedding_provider(self):
+        if self.embedding_provider is None:
+            with self._lock:
+                if self.embedding_provider is None:
+                    self.embedding_provider = get_embedding_provider()
+        return self.embedding_provider
+
+    def get_rag_service(self) -> RAGService:
+        """Trả RAGService dùng chung (build lười nếu lifespan chưa chạy)."""
+        if self.rag_service is None:
+            with self._lock:
+                if self.rag_service is None:
+                    self._build()
+        return self.rag_service
+
+    def get_ingestion_service(self) -> IngestionJobService:
+        """Worker pool ingest dùng chung (job registry nằm trong process)."""
+        if self.ingestion_service is None:
+            with self._lock:
+                if self.ingestion_service is None:
+                    self.ingestion_service = IngestionJobService()
+        return self.ingestion_service
+
+    def _build_vector_service(self) -> None:
+        self.vector_service = QdrantVectorService()
+        # Chẩn đoán kết nối một lần cho cả process (trước đây chạy ở mỗi lần khởi tạo service)
+        if not self.vector_service.check_ready():
+            return
+        try:
+            self.vector_service.ensure_collection()
+            print_success('[ServiceContainer] Qdrant collection ready')
+        except Exception as e:
+            print_error(f'[ServiceContainer] Qdrant not ready: {e}')
+
+    def _build(self) -> None:
+        # Caller giữ self._lock
+        if self.embedding_provider is None:
+            self.embedding_provider = get_embedding_provider()
+        if self.vector_service is None and VECTOR_ENGINE != 'local':
+            self._build_vector_service()
+        if self.async_vector_service is None:
+            self._build_search_router()
+        if self.rag_service is None:
+            print_info('[ServiceContainer] Building shared RAGService…')
+            self.rag_service = RAGService(
+                embedding_provider=self.embedding_provider,
+                vector_service=self.async_vector_service,
+            )
+
+
+# Singleton cho toàn bộ process
+container = ServiceContainer()
@@ -4,9 +4,13 @@ Handles document upload, processing, and deletion.
 """
 
 import asyncio
-import hashlib
-from typing import BinaryIO
+import os
+from array import array
+from concurrent.futures import Executor
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from datetime import datetime
+from sqlalchemy import delete, func, update
 from sqlmodel import Session, select
 from app.core.database import engine
 from app.models import (
@@ -19,8 +23,12 @@ from app.models import (
     ChunkCreate,
 )
 from app.schemas.common_types import CorpusUploadResponse, CorpusDeleteResponse
+from app.core.config import INGEST_BATCH_SIZE, INGEST_QUEUE_SIZE, STORAGE_DIR
+from app.utils.pipeline import run_pipeline
+from app.utils.answer_cache import get_answer_cache
+from app.utils.bm25 import get_bm25_index
 from app.utils.embedding import get_embedding_provider
-from app.services.vector import QdrantVectorService
+from app.services.vector import QdrantVectorService, chunk_payload
 from app.utils import (
     print_info,
     print_success,
@@ -29,187 +37,439 @@ from app.utils import (
     print_debug,
 )
 from app.utils.chunking import (
-    extract_text_from_pdf,
-    extract_text_from_docx,
-    naive_split_chapters,
-    chunk_by_chars,
+    extract_pdf_with_pages,
+    iter_lines,
+    iter_docx_lines,
+    iter_text_file_lines,
+    iter_chapters_with_offsets,
+    iter_chunk_spans,
+    chunk_text_hash,
+    page_spans,
 )
+from app.utils.storage import discard_file, file_md5, store_original
+
+# progress(stage, done, total) – báo tiến độ cho job ingest
+ProgressCallback = Callable[..., None]
 
 
 class CorpusService:
     """Service for managing document corpus"""
 
-    async def upload_document(self, file: BinaryIO, title: str, description: str = None, source: str = None) -> CorpusUploadResponse:
+    def ingest_file(
+        self,
+        file_path: str,
+        title: str,
+        description: str = None,
+        source: str = None,
+        file_hash: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        pdf_pool: Optional[Executor] = None,
+    ) -> CorpusUploadResponse:
         """
-        Upload and process document.
+        Ingest đồng bộ từ file trên đĩa: extract → chapter split → chunk → embed → upsert.
+        Chương và chunk sinh dần (generator) vào các batch insert/embed, không giữ bytes gốc hay toàn bộ chunk.
+        Cùng md5 với tài liệu đã ingest xong → trả tài liệu đó, không extract/embed lại.
+        Chỉ khi bản mới commit xong, file gốc mới được chuyển về STORAGE_DIR/<md5> và file gốc cũ mới bị xoá;
+        lỗi giữa chừng → tài liệu vẫn trỏ file gốc cũ, file spool do caller xoá.
+        Dùng bởi IngestionJobService (worker thread); `progress(stage, done, total)` báo tiến độ,
+        `pdf_pool` là process pool dùng chung để tách PDF lớn song song.
         """
-        print_info(f"Upload start: title='{title}', source='{source}'")
-
-        # 1. Save file to storage
-        # 2. Extract text content (PDF, DOCX, etc.)
-        # 3. Detect chapters/sections
-        # 4. Chunk text content
-        # 5. Generate embeddings
-        # 6. Save to Qdrant
-        # 7. Save metadata to MySQL
-
-        # Read bytes and identify type by simple header (endpoint already validates content_type)
-        file_content = file.read()
-        file_hash = hashlib.md5(file_content).hexdigest()
-        print_debug(f'File size={len(file_content)} bytes, md5={file_hash}')
-        text_content = ''
-        try:
-            if file_content[:4] == b'%PDF':
-                text_content = extract_text_from_pdf(file_content)
-                ext = 'pdf'
-            else:
-                # attempt DOCX
-                try:
-                    text_content = extract_text_from_docx(file_content)
-                    ext = 'docx'
-                except Exception:
-                    # fallback as TXT
-                    text_content = file_content.decode('utf-8', errors='ignore')
-                    ext = 'txt'
-        except Exception as e:
-            print_warning(f'Failed to parse file bytes smartly, fallback as raw text: {e}')
-            try:
-                text_content = file_content.decode('utf-8', errors='ignore')
-            except Exception:
-                text_content = ''
+        report = progress or (lambda stage, done=0, total=None: None)
+        print_info(f"Ingest start: title='{title}', source='{source}'")
 
+        file_hash = file_hash or file_md5(file_path)
+        print_debug(f'File size={os.path.getsize(file_path)} bytes, md5={file_hash}')
+        unchanged = self._find_ingested(file_hash)
+        if unchanged is not None:
+            return unchanged
+
+        # 1. Extract text content (PDF, DOCX, TXT)
+        report('extract')
+        lines, _, page_starts = self._open_text(file_path, pdf_pool)
+        report('extract', 1, 1)
+
+        old_chapters: Dict[str, List[int]] = {}
+        old_chunks: Dict[str, List[Tuple[int, int, int, datetime]]] = {}
+        old_path: Optional[str] = None
         with Session(engine) as session:
-            # Overwrite policy: nếu tài liệu cùng title đã tồn tại → xóa toàn bộ và ghi đè
+            # Overwrite policy: cùng title → cập nhật tăng dần, giữ chunk/vector có nội dung không đổi
             existing = session.exec(select(Document).where(Document.title == title)).first()
             if existing:
-                print_warning(f"Overwrite existing document id={existing.id} title='{title}'")
-                # Delete vectors
-                try:
-                    vector_service = QdrantVectorService()
-                    st_chunk_ids = select(Chunk.id).join(Chapter).where(Chapter.document_id == existing.id)
-                    old_chunk_ids = [cid for (cid,) in session.exec(st_chunk_ids).all()]
-                    if old_chunk_ids:
-                        vector_service.delete_points_by_ids(old_chunk_ids)
-                except Exception:
-                    print_error('Failed to delete old vectors (ignored)')
-                # Cascade delete in DB
-                quotes = session.exec(select(Quote).join(Chunk).join(Chapter).where(Chapter.document_id == existing.id)).all()
-                for q in quotes:
-                    session.delete(q)
+                print_warning(f"Re-ingest existing document id={existing.id} title='{title}' (incremental)")
+                old_chapters, old_chunks = self._previous_version(session, int(existing.id))
+                old_path = existing.file_path
+                existing.description = description
+                existing.source = source
+                # Đang ingest dở → không coi là bản trùng; file_path vẫn trỏ file gốc cũ tới khi bản mới xong
+                existing.content_hash = None
+                session.add(existing)
                 session.commit()
-                chunks = session.exec(select(Chunk).join(Chapter).where(Chapter.document_id == existing.id)).all()
-                for ch in chunks:
-                    session.delete(ch)
-                session.commit()
-                chapters_old = session.exec(select(Chapter).where(Chapter.document_id == existing.id)).all()
-                for cp in chapters_old:
-                    session.delete(cp)
-                session.commit()
-                session.delete(existing)
-                session.commit()
-            # Create document
-            document_data = DocumentCreate(
-                title=title,
-                description=description,
-                file_path=f'/storage/documents/{file_hash}.{ext}',
-                source=source,
-            )
-            document = Document.model_validate(document_data.model_dump())
-            session.add(document)
-            session.commit()
-            session.refresh(document)
-            print_success(f'Document created id={document.id}')
-
-            # Detect chapters (naive) from text_content
-            chapters = []
-            detected = naive_split_chapters(text_content)
-            for idx, (title_c, content_c) in enumerate(detected, start=1):
-                chapter_data = ChapterCreate(
-                    document_id=document.id,
-                    title=title_c[:255] or f'Chương {idx}',
-                    ordering=idx,
-                    summary=((content_c[:200] + '...') if len(content_c) > 200 else content_c),
+                doc_id_value = int(existing.id)
+            else:
+                # Create document
+                document_data = DocumentCreate(
+                    title=title,
+                    description=description,
+                    source=source,
                 )
-                chapter = Chapter.model_validate(chapter_data.model_dump())
-                session.add(chapter)
-                chapters.append((chapter, content_c))
+                document = Document.model_validate(document_data.model_dump())
+                session.add(document)
+                session.commit()
+                session.refresh(document)
+                doc_id_value = int(document.id)
+                print_success(f'Document created id={doc_id_value}')
 
-            session.commit()
-            for chapter, _ in chapters:
-                session.refresh(chapter)
-            print_success(f'Chapters created: {len(chapters)}')
-
-            # Mock chunks
-            print_info('Chunking text…')
-            total_chunks = 0
-            for chapter, content_c in chapters:
-                chunks = chunk_by_chars(content_c, max_chars=3000, overlap=500)
-                for j, chunk_text in enumerate(chunks):
-                    chunk_data = ChunkCreate(
-                        chapter_id=chapter.id,
-                        chunk_index=j,
-                        qdrant_point_id=None,
-                        chunk_text=chunk_text,
-                    )
-                    chunk = Chunk.model_validate(chunk_data.model_dump())
-                    session.add(chunk)
-                    total_chunks += 1
+        # 2. Detect chapters (naive) – ghi từng chương khi bộ tách sinh ra
+        chapter_titles: Dict[int, str] = {}
+        chapter_rows = self._iter_chapter_rows(
+            doc_id_value, iter_chapters_with_offsets(lines), chapter_titles, report, reuse=old_chapters
+        )
 
-            session.commit()
-            print_success(f'Chunks created: {total_chunks}')
-
-            # Fetch created chunks for this document
-            statement = select(Chunk).join(Chapter).where(Chapter.document_id == document.id).order_by(Chunk.id)
-            created_chunks = session.exec(statement).all()
-
-            # Generate embeddings and upsert to Qdrant
-            print_info('Generating embeddings…')
-            embedding_provider = get_embedding_provider()
-            vector_service = QdrantVectorService()
-            vector_service.ensure_collection()
-
-            texts = [c.chunk_text for c in created_chunks]
-            vectors = embedding_provider.embed_texts(texts)
-            print_success(f'Embeddings generated: {len(vectors)}')
-
-            ids = [int(c.id) for c in created_chunks]
-            payloads = []
-            doc_id_value = int(document.id)
-            for c in created_chunks:
-                payloads.append({
-                    # All chunks belong to the same document in this upload flow
-                    'document_id': doc_id_value,
-                    'chapter_id': c.chapter_id,
-                    'chunk_id': c.id,
-                    'chunk_index': c.chunk_index,
-                    'created_at': c.created_at.isoformat(),
-                })
-
-            print_info('Upserting vectors to Qdrant…')
-            vector_service.upsert_points(ids=ids, vectors=vectors, payloads=payloads)
-            print_success('Qdrant upsert completed')
-
-            # Update qdrant_point_id for each chunk to map to its id
-            print_info('Syncing qdrant_point_id to DB…')
-            for c in created_chunks:
-                c.qdrant_point_id = str(c.id)
-                session.add(c)
+        # 3-5. Pipeline chồng lấn: chunk+insert SQL (batch N+1) ‖ embed (batch N) ‖ upsert Qdrant (batch N-1)
+        print_info('Chunk → insert → embed → upsert (pipelined)…')
+        embedding_provider = get_embedding_provider()
+        vector_service = QdrantVectorService()
+        vector_service.ensure_collection()
+        counters = {'chunk': 0, 'embed': 0, 'upsert': 0, 'reused': 0}
 
-            session.commit()
-            print_success(f'Upload flow finished: doc_id={document.id}, chunks={total_chunks}')
+        def insert_stage(batch: List[Tuple[int, int, str, int]]) -> List[Dict[str, Any]]:
+            report('chunk', counters['chunk'])
+            items: List[Dict[str, Any]] = []
+            fresh: List[Tuple[Chunk, Dict[str, Any]]] = []
+            reused: List[Dict[str, Any]] = []
+            with Session(engine) as s:
+                for chapter_id, j, text, _ in batch:
+                    text_hash = chunk_text_hash(text)
+                    item = {'chapter_id': chapter_id, 'chunk_index': j, 'text': text, 'page_number': None}
+                    candidates = old_chunks.get(text_hash)
+                    if candidates:
+                        # Nội dung không đổi → giữ id (và vector); chỉ cập nhật vị trí
+                        chunk_id, old_chapter_id, old_index, created_at = candidates.pop(0)
+                        moved = (old_chapter_id, old_index) != (chapter_id, j)
+                        item.update(id=chunk_id, created_at=created_at, reused=True, moved=moved)
+                        reused.append(
+                            {'id': chunk_id, 'chapter_id': chapter_id, 'chunk_index': j, 'chunk_text': text, 'text_hash': text_hash}
+                        )
+                    else:
+                        row = Chunk.model_validate(
+                            ChunkCreate(
+                                chapter_id=chapter_id, chunk_index=j, qdrant_point_id=None, chunk_text=text, text_hash=text_hash
+                            ).model_dump()
+                        )
+                        s.add(row)
+                        item['reused'] = False
+                        fresh.append((row, item))
+                    items.append(item)
+                s.flush()
+                # Đọc giá trị trước commit để tránh refresh từng row sau commit
+                for row, item in fresh:
+                    item['id'] = int(row.id)
+                    item['created_at'] = row.created_at
+                if reused:
+                    s.execute(update(Chunk), reused)
+                    # Trang có thể đã dịch chuyển → quotes của chunk giữ lại được ghi lại bên dưới
+                    s.execute(delete(Quote).where(Quote.chunk_id.in_([r['id'] for r in reused])))
+                if page_starts is not None:
+                    s.add_all(self._page_quotes(items, [offset for *_, offset in batch], page_starts))
+                s.commit()
+            counters['chunk'] += len(items)
+            counters['reused'] += len(reused)
+            report('chunk', counters['chunk'])
+            return items
+
+        def embed_stage(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            report('embed', counters['embed'])
+            fresh = [it for it in items if not it['reused']]
+            if fresh:
+                vectors = embedding_provider.embed_texts([it['text'] for it in fresh])
+                for it, vec in zip(fresh, vectors):
+                    it['vector'] = vec
+            counters['embed'] += len(items)
+            report('embed', counters['embed'])
+            return items
+
+        def upsert_stage(items: List[Dict[str, Any]]) -> None:
+            report('upsert', counters['upsert'])
+            payloads = {
+                # All chunks belong to the same document in this upload flow
+                it['id']: chunk_payload(
+                    document_id=doc_id_value,
+                    chapter_id=it['chapter_id'],
+                    chunk_id=it['id'],
+                    chunk_index=it['chunk_index'],
+                    created_at=it['created_at'],
+                    chunk_text=it['text'],
+                    chapter_title=chapter_titles.get(it['chapter_id']),
+                    document_title=title,
+                    page_number=it['page_number'],
+                )
+                for it in items
+            }
+            fresh = [it for it in items if not it['reused']]
+            if fresh:
+                vector_service.upsert_points(
+                    ids=[it['id'] for it in fresh],
+                    vectors=[it['vector'] for it in fresh],
+                    payloads=[payloads[it['id']] for it in fresh],
+                )
+                # Sync qdrant_point_id cho batch đã upsert (bulk UPDATE theo primary key)
+                with Session(engine) as s:
+                    s.execute(update(Chunk), [{'id': it['id'], 'qdrant_point_id': str(it['id'])} for it in fresh])
+                    s.commit()
+                get_bm25_index().add_many((it['id'], it['text']) for it in fresh)
+            # Chunk giữ lại: vector không đổi, chỉ cập nhật payload khi vị trí/trang có thể đã khác
+            stale = {it['id']: payloads[it['id']] for it in items if it['reused'] and (it['moved'] or page_starts is not None)}
+            if stale:
+                vector_service.set_payloads(stale)
+            counters['upsert'] += len(items)
+            report('upsert', counters['upsert'])
+
+        stats = run_pipeline(
+            self._iter_chunk_batches(chapter_rows, INGEST_BATCH_SIZE),
+            [('chunk', insert_stage), ('embed', embed_stage), ('upsert', upsert_stage)],
+            maxsize=INGEST_QUEUE_SIZE,
+        )
+        total_chunks = counters['upsert']
+        chapter_count = len(chapter_titles)
+        for st in stats:
+            report(st.name, st.items, st.items)
+        removed = self._remove_previous(
+            doc_id_value, [entry[0] for entries in old_chunks.values() for entry in entries], set(chapter_titles)
+        )
+        # Gán hash + file gốc sau cùng: ingest dở dang không được coi là bản trùng ở lần upload sau
+        stored_path = store_original(file_path, file_hash, STORAGE_DIR)
+        with Session(engine) as s:
+            s.execute(
+                update(Document).where(Document.id == doc_id_value).values(content_hash=file_hash, file_path=stored_path)
+            )
+            s.commit()
+            if old_path != stored_path:
+                self._discard_original(s, old_path)
+        self._persist_lexical_index()
+        # Corpus đổi → câu trả lời cache có thể lỗi thời
+        get_answer_cache().clear()
+        print_success(
+            f"Upload flow finished: doc_id={doc_id_value}, chunks={total_chunks} "
+            f"(reused={counters['reused']}, removed={removed})"
+        )
 
         # Prepare return values explicitly to avoid detached instance access
         return CorpusUploadResponse(
             status='ok',
+            message=(
+                f"incremental: {counters['reused']} chunks unchanged, "
+                f"{total_chunks - counters['reused']} embedded, {removed} removed"
+                if existing
+                else None
+            ),
             document_id=doc_id_value,
-            chapter_count=len(chapters),
+            chapter_count=chapter_count,
             chunk_count=total_chunks,
         )
 
+    @staticmethod
+    def _previous_version(
+        session: Session, document_id: int
+    ) -> Tuple[Dict[str, List[int]], Dict[str, List[Tuple[int, int, int, datetime]]]]:
+        """Chương cũ {title: [id]} và chunk cũ {text_hash: [(id, chapter_id, chunk_index, created_at)]}, theo thứ tự."""
+        chapters: Dict[str, List[int]] = {}
+        for cid, ctitle in session.exec(
+            select(Chapter.id, Chapter.title).where(Chapter.document_id == document_id).order_by(Chapter.ordering)
+        ):
+            chapters.setdefault(ctitle, []).append(int(cid))
+        chunks: Dict[str, List[Tuple[int, int, int, datetime]]] = {}
+        rows = session.exec(
+            select(Chunk.id, Chunk.chapter_id, Chunk.chunk_index, Chunk.created_at, Chunk.text_hash, Chunk.chunk_text)
+            .join(Chapter)
+            .where(Chapter.document_id == document_id)
+            .order_by(Chapter.ordering, Chunk.chunk_index)
+        )
+        for cid, chapter_id, chunk_index, created_at, text_hash, chunk_text in rows:
+            # Chunk ghi trước khi có cột text_hash → băm lại từ chunk_text
+            key = text_hash or chunk_text_hash(chunk_text)
+            chunks.setdefault(key, []).append((int(cid), int(chapter_id), int(chunk_index), created_at))
+        print_info(f'Previous version: {len(chapters)} chapters, {sum(map(len, chunks.values()))} chunks')
+        return chapters, chunks
+
+    @staticmethod
+    def _remove_previous(document_id: int, chunk_ids: List[int], keep_chapter_ids: Iterable[int]) -> int:
+        """Xoá chunk (vector, BM25, quotes) không còn trong bản mới và các chương cũ không dùng lại."""
+        keep = set(keep_chapter_ids)
+        if chunk_ids:
+            get_bm25_index().remove_many(chunk_ids)
+            try:
+                QdrantVectorService().delete_points_by_ids(chunk_ids)
+            except Exception:
+                print_error('Failed to delete old vectors (ignored)')
+        with Session(engine) as s:
+            chapter_ids = [
+                int(cid) for cid in s.exec(select(Chapter.id).where(Chapter.document_id == document_id)).all() if cid not in keep
+            ]
+            if chunk_ids:
+                s.execute(delete(Quote).where(Quote.chunk_id.in_(chunk_ids)))
+                s.execute(delete(Chunk).where(Chunk.id.in_(chunk_ids)))
+            if chapter_ids:
+                s.execute(delete(Chapter).where(Chapter.id.in_(chapter_ids)))
+            s.commit()
+        if chunk_ids or chapter_ids:
+            print_info(f'Removed {len(chunk_ids)} chunks and {len(chapter_ids)} chapters from previous version')
+        return len(chunk_ids)
+
+    @staticmethod
+    def _find_ingested(file_hash: str) -> Optional[CorpusUploadResponse]:
+        """Tài liệu đã ingest xong với cùng nội dung (md5) → response của tài liệu đó, không thì None."""
+        with Session(engine) as session:
+            document = session.exec(select(Document).where(Document.content_hash == file_hash)).first()
+            if document is None:
+                return None
+            chapter_count = session.exec(select(func.count(Chapter.id)).where(Chapter.document_id == document.id)).one()
+            chunk_count = session.exec(
+                select(func.count(Chunk.id)).join(Chapter).where(Chapter.document_id == document.id)
+            ).one()
+            print_info(f"Unchanged content md5={file_hash} → document id={document.id} title='{document.title}', skip ingest")
+            return CorpusUploadResponse(
+                status='ok',
+                message=f"unchanged: same content as document '{document.title}'",
+                document_id=int(document.id),
+                chapter_count=int(chapter_count),
+                chunk_count=int(chunk_count),
+            )
+
+    @staticmethod
+    def _page_quotes(items: List[Dict[str, Any]], offsets: List[int], page_starts: Sequence[int]) -> List[Quote]:
+        """Một Quote cho mỗi trang chunk trải qua (theo thứ tự trang); gán page_number trang đầu vào item."""
+        quotes: List[Quote] = []
+        for it, offset in zip(items, offsets):
+            text = it['text']
+            for page, start, end in page_spans(page_starts, offset, len(text)):
+                excerpt = text[start:end].strip()
+                if not excerpt:
+                    continue
+                if it['page_number'] is None:
+                    it['page_number'] = page
+                quotes.append(
+                    Quote(
+                        chunk_id=it['id'],
+                        quote_text=excerpt[:300] + '...' if len(excerpt) > 300 else excerpt,
+                        excerpt_start=start,
+                        excerpt_end=end,
+                        page_number=page,
+                    )
+                )
+        return quotes
+
+    @staticmethod
+    def _iter_chapter_rows(
+        document_id: int,
+        chapters: Iterator[Tuple[str, str, int]],
+        titles: Dict[int, str],
+        report: ProgressCallback,
+        reuse: Optional[Dict[str, List[int]]] = None,
+    ) -> Iterator[Tuple[int, str, int]]:
+        """Ghi Chapter ngay khi được tách; sinh (chapter_id, nội dung, offset) và điền titles cho payload.
+
+        `reuse` {title: [id]} của bản cũ: chương trùng tiêu đề giữ nguyên id (chapter filter của client vẫn đúng).
+        """
+        count = 0
+        for idx, (title_c, content_c, offset_c) in enumerate(chapters, start=1):
+            chapter_data = ChapterCreate(
+                document_id=document_id,
+                title=title_c[:255] or f'Chương {idx}',
+                ordering=idx,
+                summary=((content_c[:200] + '...') if len(content_c) > 200 else content_c),
+            )
+            previous = (reuse or {}).get(chapter_data.title)
+            with Session(engine) as s:
+                if previous:
+                    chapter = s.get(Chapter, previous.pop(0))
+                    chapter.ordering = idx
+                    chapter.summary = chapter_data.summary
+                else:
+                    chapter = Chapter.model_validate(chapter_data.model_dump())
+                s.add(chapter)
+                s.flush()
+                chapter_id = int(chapter.id)
+                titles[chapter_id] = chapter.title
+                s.commit()
+            count = idx
+            report('chapters', count)
+            yield chapter_id, content_c, offset_c
+        report('chapters', count, count)
+        print_success(f'Chapters created: {count}')
+
+    @staticmethod
+    def _iter_chunk_batches(
+        chapter_rows: Iterable[Tuple[int, str, int]], batch_size: int
+    ) -> Iterator[List[Tuple[int, int, str, int]]]:
+        """Sinh batch (chapter_id, chunk_index, chunk_text, offset trong text tài liệu) theo thứ tự chương."""
+        batch: List[Tuple[int, int, str, int]] = []
+        for chapter_id, content_c, offset_c in chapter_rows:
+            for j, (offset, chunk_text) in enumerate(iter_chunk_spans(content_c, max_chars=3000, overlap=500)):
+                batch.append((chapter_id, j, chunk_text, offset_c + offset))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _open_text(file_path: str, pdf_pool: Optional[Executor] = None) -> Tuple[Iterator[str], str, Optional[array]]:
+        """Nhận diện loại file theo header; trả (các dòng text, ext, offset đầu mỗi trang — chỉ PDF).
+
+        PDF được tách song song theo trang từ file; DOCX/TXT đọc dần từng đoạn/dòng.
+        """
+        with open(file_path, 'rb') as f:
+            header = f.read(4)
+        try:
+            if header == b'%PDF':
+                text, page_starts = extract_pdf_with_pages(file_path, pdf_pool)
+                return iter_lines(text), 'pdf', page_starts
+            # attempt DOCX (zip container)
+            if header[:2] == b'PK':
+                try:
+                    lines = iter_docx_lines(file_path)
+                    first = next(lines, None)
+                    return (chain([first], lines) if first is not None else iter(())), 'docx', None
+                except Exception:
+                    pass
+        except Exception as e:
+            print_warning(f'Failed to parse file smartly, fallback as raw text: {e}')
+        # fallback as TXT
+        return iter_text_file_lines(file_path), 'txt', None
+
+    @staticmethod
+    def _persist_lexical_index() -> None:
+        """Ghi BM25 index ra đĩa (best-effort) để lần khởi động sau không phải build lại."""
+        index = get_bm25_index()
+        try:
+            if index.has_base:
+                index.persist()
+                return
+            # Chưa có file index: ghi lúc này chỉ gồm tài liệu vừa upload → dựng đầy đủ từ MySQL rồi nạp lại.
+            # Import trong hàm: app.db.reindex (qua build_bm25) import app.services → vòng import khi chạy CLI
+            from app.db.build_bm25 import build_bm25
+
+            print_warning('BM25 index not built yet, building from MySQL…')
+            build_bm25(index.path)
+            index.maybe_reload()
+        except Exception as e:
+            print_error(f'Failed to persist BM25 index (ignored): {e}')
+
+    @staticmethod
+    def _discard_original(session: Session, path: Optional[str]) -> None:
+        """Xoá file gốc STORAGE_DIR/<md5> khi không còn tài liệu nào trỏ tới (file ngoài STORAGE_DIR giữ nguyên)."""
+        if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(STORAGE_DIR):
+            return
+        if session.exec(select(Document.id).where(Document.file_path == path)).first() is None:
+            discard_file(path)
+
     async def delete_document(self, document_id: int) -> CorpusDeleteResponse:
         """
-        Delete document and all related data.
+        Delete document and all related data (SQL, Qdrant, BM25 chạy trong thread để không chặn event loop).
         """
+        return await asyncio.to_thread(self._delete_document, document_id)
+
+    def _delete_document(self, document_id: int) -> CorpusDeleteResponse:
         print_info(f'Delete start: document_id={document_id}')
 
         with Session(engine) as session:
@@ -226,8 +486,10 @@ class CorpusService:
                 vector_service = QdrantVectorService()
                 # Collect all chunk ids for this document
                 statement_chunks = select(Chunk.id).join(Chapter).where(Chapter.document_id == document_id)
-                chunk_ids = [cid for (cid,) in session.exec(statement_chunks).all()]
+                chunk_ids = [int(cid) for cid in session.exec(statement_chunks).all()]
                 if chunk_ids:
+                    # Chỉ gỡ khỏi bộ nhớ; ghi/dựng lại từ MySQL sau khi các dòng SQL đã xoá xong
+                    get_bm25_index().remove_many(chunk_ids)
                     print_info(f'Deleting {len(chunk_ids)} vectors from Qdrant…')
                     vector_service.delete_points_by_ids(chunk_ids)
                     print_success('Qdrant vector deletion completed')
@@ -260,9 +522,13 @@ class CorpusService:
             print_success(f'Deleted {len(chapters)} chapters')
 
             print_info('Deleting Document…')
+            original_path = document.file_path
             session.delete(document)
             session.commit()
+            self._discard_original(session, original_path)
             print_success(f'Deleted document {document_id}')
             print_success(f'Deleted document {document_id} and related records')
+        self._persist_lexical_index()
+        get_answer_cache().clear()
 
         return CorpusDeleteResponse(status='ok', deleted_document_id=document_id)
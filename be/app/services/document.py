@@ -4,6 +4,7 @@ Document service for managing documents and chapters.
 
 import time
 from typing import List, Optional, Tuple
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, select, func
 from app.core.database import engine
 from app.models import Document, Chapter, Chunk, Quote
@@ -14,6 +15,8 @@ from app.schemas.common_types import (
     ChapterSummary,
     PaginationResponse,
     ChunkSearchResponse,
+    ChunkSearchQuery,
+    ChunkSearchBatchResponse,
     ChunkSnippet,
     HighlightOffset,
     ChapterChunksResponse,
@@ -93,98 +96,137 @@ class DocumentService:
         limit: int,
     ) -> ChunkSearchResponse:
         """Semantic search dựa trên Qdrant; trả offsets để FE highlight."""
-        await asyncio.sleep(0.05)
-        from app.services.vector import QdrantVectorService
-        from app.utils.embedding import get_embedding_provider
+        from app.services.container import container
 
-        embedding = get_embedding_provider().embed_text(q)
-        vector = QdrantVectorService()
-        vector.ensure_collection()
+        embedding = await container.get_embedding_provider().aembed_text(q)
+        vector = container.get_async_vector_service()
 
-        # Cho phép filter theo doc/chapter ở payload Qdrant
-        filter_ids = None
-        # Nếu filter chapter → cần map ra list chunk thuộc chapter này
-        with Session(engine) as session:
-            if chapter_id:
-                st = select(Chunk.id).where(Chunk.chapter_id == chapter_id)
-                chunk_ids = [cid for (cid,) in session.exec(st).all()]
-                # Nếu không có, trả rỗng
-                if not chunk_ids:
-                    return ChunkSearchResponse(
-                        items=[],
-                        pagination=PaginationResponse(page=page, limit=limit, total=0),
-                    )
-            else:
-                chunk_ids = None
+        # Nếu filter chapter mà chapter không có chunk → trả rỗng
+        if chapter_id and not await asyncio.to_thread(self._chapter_has_chunks, chapter_id):
+            return ChunkSearchResponse(
+                items=[],
+                pagination=PaginationResponse(page=page, limit=limit, total=0),
+            )
 
-        # Gọi search, Qdrant không filter theo list chunk-id sẵn có trừ khi dùng payload filter.
         # Ở upload đã set payload document_id/chapter_id → dùng filter theo doc/chapter nếu cung cấp.
-        results = vector.search(
+        results = await vector.search(
             query_vector=embedding,
             top_k=limit,
             document_ids=[doc_id] if doc_id else None,
             chapter_ids=[chapter_id] if chapter_id else None,
         )
+        if not results:
+            return ChunkSearchResponse(
+                items=[],
+                pagination=PaginationResponse(page=page, limit=limit, total=0),
+            )
+        items = await asyncio.to_thread(self._build_snippets, q, results)
+        return ChunkSearchResponse(
+            items=items,
+            pagination=PaginationResponse(
+                page=page,
+                limit=limit,
+                total=len(items),
+                has_next=False,
+                has_prev=(page > 1),
+            ),
+        )
 
-        with Session(engine) as session:
-            ids = [cid for cid, _ in results]
-            if not ids:
-                return ChunkSearchResponse(
-                    items=[],
-                    pagination=PaginationResponse(page=page, limit=limit, total=0),
+    async def semantic_search_batch(self, queries: List[ChunkSearchQuery]) -> ChunkSearchBatchResponse:
+        """Nhiều truy vấn: embed một lần, một request Qdrant query_batch_points, một lần nạp chunk từ MySQL."""
+        from app.services.container import container
+        from app.services.vector import VectorQuery
+
+        vectors = await container.get_embedding_provider().aembed_texts([item.q for item in queries])
+        hits = await container.get_async_vector_service().search_batch(
+            [
+                VectorQuery(
+                    vector=vector,
+                    top_k=item.limit,
+                    document_ids=[item.doc_id] if item.doc_id else None,
+                    chapter_ids=[item.chapter_id] if item.chapter_id else None,
                 )
+                for item, vector in zip(queries, vectors)
+            ]
+        )
+        results_list = [[(h.chunk_id, h.score) for h in query_hits] for query_hits in hits]
+        items_list = await asyncio.to_thread(
+            self._build_snippets_batch, [item.q for item in queries], results_list
+        )
+        return ChunkSearchBatchResponse(
+            results=[
+                ChunkSearchResponse(
+                    items=items,
+                    pagination=PaginationResponse(page=1, limit=item.limit, total=len(items)),
+                )
+                for item, items in zip(queries, items_list)
+            ]
+        )
 
-            chunks = session.exec(select(Chunk).where(Chunk.id.in_(ids))).all()
+    @staticmethod
+    def _chapter_has_chunks(chapter_id: int) -> bool:
+        with Session(engine) as session:
+            return session.exec(select(Chunk.id).where(Chunk.chapter_id == chapter_id).limit(1)).first() is not None
+
+    @classmethod
+    def _build_snippets(cls, q: str, results: List[Tuple[int, float]]) -> List[ChunkSnippet]:
+        return cls._build_snippets_batch([q], [results])[0]
+
+    @staticmethod
+    def _build_snippets_batch(
+        queries: List[str], results_list: List[List[Tuple[int, float]]]
+    ) -> List[List[ChunkSnippet]]:
+        """Nạp chunk của mọi kết quả trong một truy vấn SQL rồi dựng snippet + offsets (giữ thứ tự score)."""
+        ids = list({cid for results in results_list for cid, _ in results})
+        if not ids:
+            return [[] for _ in results_list]
+        with Session(engine) as session:
+            chunks = session.exec(
+                select(Chunk).where(Chunk.id.in_(ids)).options(joinedload(Chunk.chapter), selectinload(Chunk.quotes))
+            ).unique().all()
             # Map id→chunk
             id_to_chunk = {c.id: c for c in chunks}
 
-            items: List[ChunkSnippet] = []
-            for cid, score in results:
-                ch = id_to_chunk.get(cid)
-                if not ch:
-                    continue
-                # Lấy page_number nếu có Quote
-                page_number = None
-                if ch.quotes:
-                    page_number = ch.quotes[0].page_number
-                text = ch.chunk_text
-                # Tính offsets đơn giản: tìm tất cả match của q (case-insensitive)
-                offsets: List[HighlightOffset] = []
-                q_lower = q.lower()
-                txt_lower = text.lower()
-                start = 0
-                while True:
-                    idx = txt_lower.find(q_lower, start)
-                    if idx == -1:
-                        break
-                    offsets.append(HighlightOffset(start=idx, end=idx + len(q)))
-                    start = idx + len(q)
-                    if len(offsets) >= 5:
-                        break
-
-                snippet_text = text[:300] + '...' if len(text) > 300 else text
-                items.append(
-                    ChunkSnippet(
-                        chunk_id=ch.id,
-                        document_id=ch.chapter.document_id,
-                        chapter_id=ch.chapter_id,
-                        page_number=page_number,
-                        score=float(score),
-                        snippet=snippet_text,
-                        offsets=offsets,
-                    )
-                )
+            out: List[List[ChunkSnippet]] = []
+            for q, results in zip(queries, results_list):
+                items: List[ChunkSnippet] = []
+                for cid, score in results:
+                    ch = id_to_chunk.get(cid)
+                    if not ch:
+                        continue
+                    # Lấy page_number nếu có Quote
+                    page_number = None
+                    if ch.quotes:
+                        page_number = ch.quotes[0].page_number
+                    text = ch.chunk_text
+                    # Tính offsets đơn giản: tìm tất cả match của q (case-insensitive)
+                    offsets: List[HighlightOffset] = []
+                    q_lower = q.lower()
+                    txt_lower = text.lower()
+                    start = 0
+                    while True:
+                        idx = txt_lower.find(q_lower, start)
+                        if idx == -1:
+                            break
+                        offsets.append(HighlightOffset(start=idx, end=idx + len(q)))
+                        start = idx + len(q)
+                        if len(offsets) >= 5:
+                            break
 
-            return ChunkSearchResponse(
-                items=items,
-                pagination=PaginationResponse(
-                    page=page,
-                    limit=limit,
-                    total=len(items),
-                    has_next=False,
-                    has_prev=(page > 1),
-                ),
-            )
+                    snippet_text = text[:300] + '...' if len(text) > 300 else text
+                    items.append(
+                        ChunkSnippet(
+                            chunk_id=ch.id,
+                            document_id=ch.chapter.document_id,
+                            chapter_id=ch.chapter_id,
+                            page_number=page_number,
+                            score=float(score),
+                            snippet=snippet_text,
+                            offsets=offsets,
+                        )
+                    )
+                out.append(items)
+            return out
 
     async def get_chunks_by_chapter(self, chapter_id: int, page: int, limit: int, q: Optional[str] = None) -> ChapterChunksResponse:
         """Lấy danh sách chunks theo chapter có phân trang, kèm highlights nếu có q."""
@@ -203,7 +245,7 @@ class DocumentService:
             count_q = select(func.count(Chunk.id)).where(Chunk.chapter_id == chapter_id)
             total = session.exec(count_q).one()
             offset = (page - 1) * limit
-            items_db = session.exec(base_q.offset(offset).limit(limit)).all()
+            items_db = session.exec(base_q.offset(offset).limit(limit).options(selectinload(Chunk.quotes))).all()
 
             items: List[ChunkListItem] = []
             for ch in items_db:
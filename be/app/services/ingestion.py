@@ -0,0 +1,142 @@
+"""
+Ingestion job service.
+Chạy ingest tài liệu trong worker pool nền; /corpus/upload chỉ lưu file và trả job id.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from app.core.config import INGEST_WORKERS, INGEST_JOB_TTL_SECONDS, PDF_EXTRACT_WORKERS, STORAGE_DIR, UPLOAD_MAX_BYTES
+from app.schemas.common_types import CorpusJobResponse, CorpusJobStage
+from app.services.corpus import CorpusService
+from app.utils.storage import spool_to_file
+from app.utils.color import print_info, print_success, print_error
+
+INGEST_STAGES = ['extract', 'chapters', 'chunk', 'embed', 'upsert']
+
+
+class IngestionJobService:
+    """Worker pool + registry trạng thái job (trong process); giữ một process pool tách PDF dùng chung cho mọi job."""
+
+    def __init__(self, max_workers: int = INGEST_WORKERS, pdf_workers: int = PDF_EXTRACT_WORKERS) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='ingest')
+        # spawn: process cha có nhiều thread (uvicorn, ingest worker) → fork không an toàn.
+        # Worker chỉ import app.workers.pdf_pages và sống suốt vòng đời service → chi phí khởi động trả một lần.
+        self._pdf_pool = (
+            ProcessPoolExecutor(max_workers=pdf_workers, mp_context=multiprocessing.get_context('spawn'))
+            if pdf_workers > 1
+            else None
+        )
+        self._jobs: Dict[str, CorpusJobResponse] = {}
+        # (job_id, stage) → thời điểm stage bắt đầu, để tính throughput
+        self._stage_started: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self.upload_dir = os.path.join(STORAGE_DIR, 'uploads')
+
+    def submit(self, file: BinaryIO, title: str, description: str = None, source: str = None) -> CorpusJobResponse:
+        """Spool file upload ra disk (vừa ghi vừa băm) và đưa job vào hàng đợi; trả trạng thái ban đầu.
+
+        Vượt UPLOAD_MAX_BYTES → UploadTooLargeError.
+        """
+        self._cleanup_jobs()
+        job_id = uuid.uuid4().hex
+        file_path = os.path.join(self.upload_dir, job_id)
+        file_hash, size = spool_to_file(file, file_path, UPLOAD_MAX_BYTES)
+        job = CorpusJobResponse(
+            job_id=job_id,
+            title=title,
+            stages=[CorpusJobStage(name=name) for name in INGEST_STAGES],
+        )
+        with self._lock:
+            self._jobs[job_id] = job
+        print_info(f"[Ingestion] Job {job_id} queued: title='{title}', {size} bytes")
+        self._executor.submit(self._run, job_id, file_path, file_hash, title, description, source)
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[CorpusJobResponse]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._pdf_pool is not None:
+            self._pdf_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job_id: str, file_path: str, file_hash: str, title: str, description: str, source: str) -> None:
+        with self._lock:
+            self._jobs[job_id].state = 'running'
+        try:
+            result = CorpusService().ingest_file(
+                file_path,
+                title,
+                description,
+                source,
+                file_hash=file_hash,
+                progress=lambda stage, done=0, total=None: self._progress(job_id, stage, done, total),
+                pdf_pool=self._pdf_pool,
+            )
+            with self._lock:
+                job = self._jobs[job_id]
+                for st in job.stages:
+                    st.status = 'done'
+                job.state = 'done'
+                job.result = result
+                job.finished_at = datetime.now()
+            print_success(f'[Ingestion] Job {job_id} done: doc_id={result.document_id}')
+        except Exception as e:
+            print_error(f'[Ingestion] Job {job_id} failed: {e}')
+            with self._lock:
+                job = self._jobs[job_id]
+                for st in job.stages:
+                    if st.status == 'running':
+                        st.status = 'failed'
+                job.state = 'failed'
+                job.status = 'error'
+                job.error = str(e)
+                job.finished_at = datetime.now()
+        finally:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def _progress(self, job_id: str, stage: str, done: int = 0, total: Optional[int] = None) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.stage = stage
+            now = time.time()
+            for st in job.stages:
+                if st.name == stage:
+                    started = self._stage_started.setdefault((job_id, stage), now)
+                    st.done = done
+                    if total is not None:
+                        st.total = total
+                    st.status = 'done' if st.total is not None and done >= st.total else 'running'
+                    st.elapsed_seconds = round(now - started, 3)
+                    if st.elapsed_seconds > 0:
+                        st.items_per_second = round(done / st.elapsed_seconds, 2)
+                    break
+
+    def _cleanup_jobs(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [
+                jid
+                for jid, job in self._jobs.items()
+                if job.finished_at and now - job.finished_at.timestamp() > INGEST_JOB_TTL_SECONDS
+            ]
+            for jid in expired:
+                self._jobs.pop(jid, None)
+            for key in [k for k in self._stage_started if k[0] not in self._jobs]:
+                self._stage_started.pop(key, None)
@@ -0,0 +1,240 @@
+"""
+Local vector engine: ma trận embedding memory-mapped (NumPy .npy) + mảng id/document/chapter.
+Cùng interface search với QdrantVectorService; dùng làm fallback khi Qdrant lỗi hoặc engine chính cho corpus nhỏ.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_DTYPE,
+    QDRANT_DISTANCE,
+    RAG_TOP_K,
+    VECTOR_ENGINE,
+    VECTOR_LOCAL_FALLBACK,
+)
+from app.services.vector import AsyncQdrantVectorService, VectorHit, VectorQuery
+from app.utils.color import print_info, print_warning
+
+_FILES = ("vectors.npy", "ids.npy", "document_ids.npy", "chapter_ids.npy")
+
+
+def _cosine() -> bool:
+    return (QDRANT_DISTANCE or "Cosine").lower() == "cosine"
+
+
+def write_local_index(
+    ids: np.ndarray,
+    vectors: np.ndarray,
+    document_ids: np.ndarray,
+    chapter_ids: np.ndarray,
+    index_dir: str = LOCAL_INDEX_DIR,
+    dtype: str = LOCAL_INDEX_DTYPE,
+    meta: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Ghi index ra đĩa; từng file ghi tạm rồi os.replace, meta.json ghi cuối làm mốc phiên bản."""
+    os.makedirs(index_dir, exist_ok=True)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if _cosine() and len(vectors):
+        # Chuẩn hoá sẵn → cosine = dot product lúc search
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+    arrays = {
+        "vectors.npy": vectors.astype(np.float16 if dtype == "float16" else np.float32),
+        "ids.npy": np.asarray(ids, dtype=np.int64),
+        "document_ids.npy": np.asarray(document_ids, dtype=np.int64),
+        "chapter_ids.npy": np.asarray(chapter_ids, dtype=np.int64),
+    }
+    for name, arr in arrays.items():
+        tmp = os.path.join(index_dir, f".{name}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, os.path.join(index_dir, name))
+    info = {
+        "count": int(len(arrays["ids.npy"])),
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "dtype": str(arrays["vectors.npy"].dtype),
+        "normalized": _cosine(),
+        "built_at": time.time(),
+        **(meta or {}),
+    }
+    tmp = os.path.join(index_dir, ".meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    os.replace(tmp, os.path.join(index_dir, "meta.json"))
+
+
+class LocalVectorService:
+    """Search top-k bằng NumPy trên ma trận mmap; tự nạp lại khi meta.json đổi (sau khi build lại index)."""
+
+    def __init__(self, index_dir: str = LOCAL_INDEX_DIR) -> None:
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._loaded_mtime: Optional[float] = None
+        self.vectors: Optional[np.ndarray] = None
+        self.ids = self.document_ids = self.chapter_ids = np.zeros(0, dtype=np.int64)
+        self.normalized = True
+        self._maybe_reload()
+
+    @property
+    def available(self) -> bool:
+        self._maybe_reload()
+        return self.vectors is not None and len(self.ids) > 0
+
+    def _maybe_reload(self) -> None:
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        try:
+            mtime = os.stat(meta_path).st_mtime
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        with self._lock:
+            if mtime == self._loaded_mtime:
+                return
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                arrays = [np.load(os.path.join(self.index_dir, name), mmap_mode="r") for name in _FILES]
+            except Exception as e:
+                print_warning(f"[LocalVector] load index failed: {e}")
+                return
+            self.vectors, self.ids, self.document_ids, self.chapter_ids = arrays
+            self.normalized = bool(meta.get("normalized", True))
+            self._loaded_mtime = mtime
+            print_info(f"[LocalVector] loaded {len(self.ids)} vectors ({meta.get('dtype')}) from {self.index_dir}")
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: Optional[int] = None,
+        document_ids: Optional[List[int]] = None,
+        chapter_ids: Optional[List[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        hits = self.search_hits(query_vector, top_k, document_ids, chapter_ids, with_payload=False)
+        return [(h.chunk_id, h.score) for h in hits]
+
+    def search_hits(
+        self,
+        query_vector: List[float],
+        top_k: Optional[int] = None,
+        document_ids: Optional[List[int]] = None,
+        chapter_ids: Optional[List[int]] = None,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+    ) -> List[VectorHit]:
+        """Top-k theo dot product (cosine nếu index đã chuẩn hoá), lọc document/chapter bằng mask."""
+        self._maybe_reload()
+        vectors = self.vectors
+        if vectors is None or not len(self.ids):
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        if self.normalized:
+            norm = float(np.linalg.norm(q))
+            q = q / norm if norm else q
+        scores = (vectors @ q.astype(vectors.dtype)).astype(np.float32)
+        mask = None
+        if document_ids:
+            mask = np.isin(self.document_ids, document_ids)
+        if chapter_ids:
+            chapter_mask = np.isin(self.chapter_ids, chapter_ids)
+            mask = chapter_mask if mask is None else mask & chapter_mask
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        k = min(top_k or RAG_TOP_K, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits: List[VectorHit] = []
+        for i in top:
+            if not np.isfinite(scores[i]):
+                break
+            payload = (
+                {
+                    "document_id": int(self.document_ids[i]),
+                    "chapter_id": int(self.chapter_ids[i]),
+                    "chunk_id": int(self.ids[i]),
+                }
+                if with_payload
+                else {}
+            )
+            hits.append(
+                VectorHit(
+                    chunk_id=int(self.ids[i]),
+                    score=float(scores[i]),
+                    payload=payload,
+                    vector=np.asarray(vectors[i], dtype=np.float32).tolist() if with_vectors else None,
+                )
+            )
+        return hits
+
+    def search_batch(
+        self,
+        queries: List[VectorQuery],
+        with_payload: bool = False,
+        with_vectors: bool = False,
+    ) -> List[List[VectorHit]]:
+        return [
+            self.search_hits(q.vector, q.top_k, q.document_ids, q.chapter_ids, with_payload, with_vectors)
+            for q in queries
+        ]
+
+
+class VectorSearchRouter:
+    """Interface search async như AsyncQdrantVectorService; chọn engine theo VECTOR_ENGINE và fallback sang local khi Qdrant lỗi."""
+
+    def __init__(
+        self,
+        primary: Optional[AsyncQdrantVectorService] = None,
+        local: Optional[LocalVectorService] = None,
+        engine: str = VECTOR_ENGINE,
+        fallback: bool = VECTOR_LOCAL_FALLBACK,
+    ) -> None:
+        self.engine = engine
+        self.fallback = fallback
+        self.primary = primary
+        self.local = local
+        # Sau một lỗi Qdrant, đi thẳng local trong một khoảng ngắn thay vì chờ timeout ở mỗi request
+        self.cooldown_seconds = 30.0
+        self._primary_down_until = 0.0
+
+    def _use_local(self) -> bool:
+        if self.engine == "local" or self.primary is None:
+            return True
+        return time.monotonic() < self._primary_down_until and self._can_fallback()
+
+    def _can_fallback(self) -> bool:
+        return self.fallback and self.local is not None and self.local.available
+
+    async def _call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        if self._use_local():
+            return await self._call_local(name, *args, **kwargs)
+        try:
+            return await getattr(self.primary, name)(*args, **kwargs)
+        except Exception as e:
+            if not self._can_fallback():
+                raise
+            self._primary_down_until = time.monotonic() + self.cooldown_seconds
+            print_warning(f"[VectorSearchRouter] Qdrant {name} failed, using local index: {e}")
+            return await self._call_local(name, *args, **kwargs)
+
+    async def _call_local(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        # Brute-force NumPy trên mmap tốn CPU/IO → chạy trong thread, không chặn event loop
+        return await asyncio.to_thread(getattr(self.local, name), *args, **kwargs)
+
+    async def search(self, *args: Any, **kwargs: Any) -> List[Tuple[int, float]]:
+        return await self._call("search", *args, **kwargs)
+
+    async def search_hits(self, *args: Any, **kwargs: Any) -> List[VectorHit]:
+        return await self._call("search_hits", *args, **kwargs)
+
+    async def search_batch(self, *args: Any, **kwargs: Any) -> List[List[VectorHit]]:
+        return await self._call("search_batch", *args, **kwargs)
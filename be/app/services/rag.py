@@ -8,17 +8,36 @@ import asyncio
 from typing import List, Tuple, Dict, Optional, AsyncIterator
 from sqlmodel import Session, select
 from app.core.database import engine
-from app.models import Chunk
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Chunk, Chapter
 from app.schemas.common_types import (
     ChatResponse,
     ChatSource,
     ChatDebugInfo,
     ChatStreamEvent,
 )
-from app.core.config import RAG_TOP_K
+from app.core.config import (
+    RAG_TOP_K,
+    QDRANT_PAYLOAD_DENORMALIZED,
+    ANSWER_CACHE_ENABLED,
+    RAG_COALESCE_ENABLED,
+    RAG_MMR_ENABLED,
+    RAG_MMR_LAMBDA,
+    RAG_MMR_POOL_SIZE,
+    RAG_HYBRID_ENABLED,
+    RAG_RRF_K,
+    RAG_CONTEXT_MAX_TOKENS,
+    RAG_MEMORY_MAX_TOKENS,
+)
+from app.utils.answer_cache import get_answer_cache
+from app.utils.embedding_cache import normalize_text
+from app.utils.singleflight import SingleFlight
+from app.utils.mmr import mmr_select
+from app.utils.bm25 import get_bm25_index
+from app.utils.context import ContextPiece, assemble_context, cap_memory, estimate_tokens
 from app.utils.embedding import get_embedding_provider
-from app.services.vector import QdrantVectorService
-from app.utils.llm import get_chat_model, build_prompt, stream_answer
+from app.services.vector import AsyncQdrantVectorService, VectorHit, chunk_payload
+from app.utils.llm import get_chat_model, build_prompt, stream_answer, message_text
 from app.utils.color import (
     print_info,
     print_debug,
@@ -33,17 +52,22 @@ from langgraph.graph import StateGraph, START, END
 class RAGService:
     """Service for Retrieval-Augmented Generation"""
 
-    def __init__(self):
+    def __init__(self, embedding_provider=None, vector_service=None, lexical_index=None):
         self.vector_search_timeout = 5.0
         self.llm_timeout = 10.0
-        # Initialize embedding and vector services
-        self.embedding_provider = get_embedding_provider()
-        self.vector_service = QdrantVectorService()
-        # Ensure collection exists
-        try:
-            self.vector_service.ensure_collection()
-        except Exception:
-            pass
+        # Initialize embedding and vector services (inject từ ServiceContainer nếu có)
+        self.embedding_provider = embedding_provider or get_embedding_provider()
+        if vector_service is None:
+            # Collection được ensure ở ServiceContainer lúc startup
+            vector_service = AsyncQdrantVectorService()
+        # AsyncQdrantVectorService hoặc VectorSearchRouter (fallback index local)
+        self.vector_service = vector_service
+        # BM25 trong process cho nhánh lexical của hybrid search (None khi tắt)
+        if lexical_index is None and RAG_HYBRID_ENABLED:
+            lexical_index = get_bm25_index()
+        self.lexical_index = lexical_index
+        # Gộp các câu hỏi giống nhau đang chạy đồng thời
+        self._flights = SingleFlight()
         # Build LangGraph agent
         try:
             self._graph = self._build_agent_graph()
@@ -58,55 +82,41 @@ class RAGService:
         async def node_retrieve(state: dict) -> dict:
             print_debug(f"[_build_agent_graph.node_retrieve] state={state}")
             question: str = state["question"]
-            retrieved = await self._search_vectors(question)
+            hits = await self._search_hits(question)
+            retrieved = [(h.chunk_id, h.score) for h in hits]
             print_debug(f"[_build_agent_graph.node_retrieve] retrieved={retrieved}")
-            # Pass through all keys from state, add retrieved
+            # Pass through all keys from state, add retrieved (+ hits kèm payload)
             new_state = dict(state)
             new_state["retrieved"] = retrieved
+            new_state["hits"] = hits
             return new_state
 
         async def node_context(state: dict) -> dict:
             print_debug(f"[_build_agent_graph.node_context] state={state}")
             retrieved = state.get("retrieved") or []
-            sources, context_text = await self._get_context_from_chunks(retrieved)
+            hits: List[VectorHit] = state.get("hits") or []
+            if QDRANT_PAYLOAD_DENORMALIZED and hits:
+                # Payload đã đủ chunk_text + tiêu đề → không cần round trip MySQL; chỉ nạp chunk thiếu payload (BM25)
+                hits = await self._fill_missing_payloads(hits)
+                sources, context_text, titles = self._get_context_from_payloads(hits)
+            else:
+                priority = {h.chunk_id: h.rank_score for h in hits if h.rank_score is not None}
+                sources, context_text, titles = await self._get_context_from_chunks(retrieved, priority)
             print_debug(f"[_build_agent_graph.node_context] sources={sources}")
             print_debug(
                 f"[_build_agent_graph.node_context] context_text={context_text[:200]}"
             )
             # build citations
-            citations_text = ""
-            if sources:
-                from sqlmodel import select
-                from sqlalchemy.orm import selectinload
-                from app.core.database import engine
-                from app.models import Chapter
-
-                with Session(engine) as session:
-                    chapter_ids = [s.chapter_id for s in sources]
-                    chapters = session.exec(
-                        select(Chapter)
-                        .where(Chapter.id.in_(chapter_ids))
-                        .options(selectinload(Chapter.document))
-                    ).all()
-                    chap_map = {c.id: c for c in chapters}
-                lines = []
-                for s in sources[:5]:
-                    chapter = chap_map.get(s.chapter_id)
-                    doc_title = chapter.document.title if chapter else "Tài liệu"
-                    ch_title = chapter.title if chapter else "Chương"
-                    page = f" → trang {s.page_number}" if s.page_number else ""
-                    lines.append(
-                        f"- [{doc_title}] → [{ch_title}]{page}: {s.text[:120]}…"
-                    )
-                citations_text = "\n".join(lines)
-                print_debug(
-                    f"[_build_agent_graph.node_context] citations_text={citations_text}"
-                )
+            citations_text = self._format_citations(sources, titles)
+            print_debug(
+                f"[_build_agent_graph.node_context] citations_text={citations_text}"
+            )
             # Pass through all keys from state, add/overwrite sources, context_text, citations_text
             new_state = dict(state)
             new_state["sources"] = sources
             new_state["context_text"] = context_text
             new_state["citations_text"] = citations_text
+            new_state["context_tokens"] = estimate_tokens(context_text)
             return new_state
 
         async def node_generate(state: dict) -> dict:
@@ -117,16 +127,25 @@ class RAGService:
             session_id: Optional[str] = state.get("session_id")
             memory_text = self._get_memory_context(session_id)
             print_debug(f"[_build_agent_graph.node_generate] memory_text={memory_text}")
-            answer = await self._generate_answer(
+            prompt_tokens = self._prompt_tokens(question, context_text, citations_text, memory_text)
+            # Stream token từ LLM để astream_events đẩy tới SSE ngay khi có token
+            parts: List[str] = []
+            outcome: Dict[str, bool] = {}
+            async for text in self._stream_answer(
                 question,
                 context_text,
                 citations_text=citations_text,
                 memory_text=memory_text,
-            )
+                outcome=outcome,
+            ):
+                parts.append(text)
+            answer = "".join(parts)
             print_success(f"[_build_agent_graph.node_generate] answer={answer}")
             # Pass through all keys from state, add/overwrite answer
             new_state = dict(state)
             new_state["answer"] = answer
+            new_state["answer_ok"] = outcome.get("ok", False)
+            new_state["prompt_tokens"] = prompt_tokens
             return new_state
 
         graph.add_node("retrieve", node_retrieve)
@@ -139,11 +158,32 @@ class RAGService:
         print_debug("[_build_agent_graph] LangGraph agent compiled.")
         return graph.compile()
 
+    def _flight_key(self, question: str, include_debug: bool, session_id: Optional[str]) -> Optional[str]:
+        """Key single-flight theo câu hỏi chuẩn hoá; None khi phiên có memory (câu trả lời phụ thuộc phiên)."""
+        if not RAG_COALESCE_ENABLED or self._get_memory_context(session_id):
+            return None
+        return f"{int(include_debug)}:{normalize_text(question)}"
+
     async def query(
         self,
         question: str,
         include_debug: bool = False,
         session_id: Optional[str] = None,
+    ) -> ChatResponse:
+        """RAG query; request trùng câu hỏi đang chạy dùng chung một lần thực thi."""
+        key = self._flight_key(question, include_debug, session_id)
+        if key is None:
+            return await self._run_query(question, include_debug, session_id)
+        response = await self._flights.do(
+            key, lambda: self._run_query(question, include_debug, None)
+        )
+        return response.model_copy(deep=True)
+
+    async def _run_query(
+        self,
+        question: str,
+        include_debug: bool = False,
+        session_id: Optional[str] = None,
     ) -> ChatResponse:
         """
         Main RAG query function.
@@ -158,6 +198,13 @@ class RAGService:
         )
         print_debug(f"[RAGService.query] include_debug={include_debug}")
 
+        cache_vec, cached = await self._lookup_answer_cache(question, session_id)
+        if cached is not None:
+            print_success("[RAGService.query] Semantic answer cache hit.")
+            if include_debug:
+                cached.debug = self._cached_debug_info(cached, start_time)
+            return cached
+
         # Run via LangGraph if available
         if self._graph is not None:
             state_in = {"question": question, "session_id": session_id}
@@ -169,6 +216,9 @@ class RAGService:
             retrieved = state_out.get("retrieved", []) or []
             sources = state_out.get("sources", []) or []
             answer = state_out.get("answer", "")
+            answer_ok = bool(state_out.get("answer_ok"))
+            context_tokens = state_out.get("context_tokens")
+            prompt_tokens = state_out.get("prompt_tokens")
             print_debug(
                 f"[RAGService.query] LangGraph used, retrieved={len(retrieved)}, sources={len(sources)}"
             )
@@ -202,7 +252,7 @@ class RAGService:
             )
 
             # Get metadata and context
-            sources, context_text = await self._get_context_from_chunks(retrieved)
+            sources, context_text, titles = await self._get_context_from_chunks(retrieved)
             print_debug(
                 f"[RAGService.query] _get_context_from_chunks sources={sources}"
             )
@@ -214,28 +264,7 @@ class RAGService:
             )
 
             # Build citations text for prompt tailing
-            citations_text = ""
-            if sources:
-                # Format: [doc_title] → [chapter] → [page?] + short quote
-                print("Having Source")
-                with Session(engine) as session:
-                    from app.models import Chapter
-
-                    chapter_ids = [s.chapter_id for s in sources]
-                    chapters = session.exec(
-                        select(Chapter).where(Chapter.id.in_(chapter_ids))
-                    ).all()
-                    chap_map = {c.id: c for c in chapters}
-                lines = []
-                for s in sources[:5]:
-                    chapter = chap_map.get(s.chapter_id)
-                    doc_title = chapter.document.title if chapter else "Tài liệu"
-                    ch_title = chapter.title if chapter else "Chương"
-                    page = f" → trang {s.page_number}" if s.page_number else ""
-                    lines.append(
-                        f"- [{doc_title}] → [{ch_title}]{page}: {s.text[:120]}…"
-                    )
-                citations_text = "\n".join(lines)
+            citations_text = self._format_citations(sources, titles)
             print_debug(f"[RAGService.query] citations_text={citations_text}")
             print_debug(
                 f"[RAGService.query] Citations text built, length={len(citations_text)}"
@@ -245,7 +274,9 @@ class RAGService:
             memory_text = self._get_memory_context(session_id)
             print_debug(f"[RAGService.query] memory_text={memory_text}")
             print_debug(f"[RAGService.query] Memory context length={len(memory_text)}")
-            answer = await self._generate_answer(
+            context_tokens = estimate_tokens(context_text)
+            prompt_tokens = self._prompt_tokens(question, context_text, citations_text, memory_text)
+            answer, answer_ok = await self._generate_answer(
                 question,
                 context_text,
                 citations_text=citations_text,
@@ -264,21 +295,49 @@ class RAGService:
                 retrieved_chunks=[cid for cid, _ in retrieved],
                 query_time_ms=(total_time - start_time) * 1000,
                 vector_search_time_ms=(vector_time - start_time) * 1000,
+                context_tokens=context_tokens,
+                prompt_tokens=prompt_tokens,
             )
 
         num_citations = min(len(sources), RAG_TOP_K)
-        return ChatResponse(
+        response = ChatResponse(
             answer=answer,
             sources=sources,
             num_citations=num_citations,
             debug=debug_info,
         )
+        self._store_answer_cache(cache_vec, response, answer_ok)
+        return response
 
     async def stream_query(
         self,
         question: str,
         include_debug: bool = False,
         session_id: Optional[str] = None,
+    ) -> AsyncIterator[ChatStreamEvent]:
+        """Stream SSE; subscriber cùng câu hỏi nhận chung một luồng token."""
+        key = self._flight_key(question, include_debug, session_id)
+        if key is None:
+            async for event in self._run_stream_query(question, include_debug, session_id):
+                yield event
+            return
+        shared = self._flights.stream(
+            key, lambda: self._run_stream_query(question, include_debug, None)
+        )
+        async for event in shared:
+            # Luồng chung chạy không session → mỗi subscriber tự ghi memory của mình
+            if event.type == "done" and session_id:
+                try:
+                    self.append_memory(session_id, question, event.data["response"]["answer"])
+                except Exception:
+                    pass
+            yield event
+
+    async def _run_stream_query(
+        self,
+        question: str,
+        include_debug: bool = False,
+        session_id: Optional[str] = None,
     ) -> AsyncIterator[ChatStreamEvent]:
         """Stream các sự kiện SSE cho phiên chat theo LangGraph pattern."""
         start_time = time.time()
@@ -288,40 +347,87 @@ class RAGService:
         print_debug(f"[RAGService.stream_query] include_debug={include_debug}")
         yield ChatStreamEvent(type="start", data={"message": "started"})
 
-        # Run via LangGraph if available
+        cache_vec, cached = await self._lookup_answer_cache(question, session_id)
+        if cached is not None:
+            # Cache hit: phát lại đủ chuỗi sự kiện, không gọi Qdrant/Gemini
+            print_success("[RAGService.stream_query] Semantic answer cache hit.")
+            if include_debug:
+                cached.debug = self._cached_debug_info(cached, start_time)
+            yield ChatStreamEvent(
+                type="retrieval",
+                data={
+                    "retrieved_chunks": [s.chunk_id for s in cached.sources],
+                    "count": len(cached.sources),
+                },
+            )
+            yield ChatStreamEvent(
+                type="sources", data={"sources": [s.model_dump() for s in cached.sources]}
+            )
+            yield ChatStreamEvent(type="token", data={"text": cached.answer})
+            try:
+                self.append_memory(session_id, question, cached.answer)
+            except Exception:
+                pass
+            yield ChatStreamEvent(type="done", data={"response": cached.model_dump()})
+            return
+
+        # Run via LangGraph if available: astream_events để phát sự kiện ngay khi từng node xong
         if self._graph is not None:
             state_in = {"question": question, "session_id": session_id}
             print_debug(f"[RAGService.stream_query] LangGraph state_in={state_in}")
-            graph_start = time.time()
-            state_out = await self._graph.ainvoke(state_in)
-            print_debug(f"[RAGService.stream_query] LangGraph state_out={state_out}")
-            vector_time = graph_start  # unknown granular timing, fallback
+            state_out: dict = dict(state_in)
+            vector_time = start_time
+            first_token_time: Optional[float] = None
+            async for event in self._graph.astream_events(state_in, version="v2"):
+                kind = event.get("event")
+                node = (event.get("metadata") or {}).get("langgraph_node")
+                if kind == "on_chat_model_stream" and node == "generate":
+                    text = message_text(event.get("data", {}).get("chunk"))
+                    if text:
+                        if first_token_time is None:
+                            first_token_time = time.time()
+                        yield ChatStreamEvent(type="token", data={"text": text})
+                    continue
+                if kind != "on_chain_end" or event.get("name") != node:
+                    continue
+                output = event.get("data", {}).get("output")
+                if isinstance(output, dict):
+                    state_out.update(output)
+                if node == "retrieve":
+                    vector_time = time.time()
+                    retrieved = state_out.get("retrieved", []) or []
+                    yield ChatStreamEvent(
+                        type="retrieval",
+                        data={
+                            "retrieved_chunks": [cid for cid, _ in retrieved],
+                            "count": len(retrieved),
+                        },
+                    )
+                elif node == "context":
+                    sources = state_out.get("sources", []) or []
+                    yield ChatStreamEvent(
+                        type="sources", data={"sources": [s.model_dump() for s in sources]}
+                    )
             retrieved = state_out.get("retrieved", []) or []
             sources = state_out.get("sources", []) or []
             answer = state_out.get("answer", "")
+            answer_ok = bool(state_out.get("answer_ok"))
             citations_text = state_out.get("citations_text", "")
             print_debug(
                 f"[RAGService.stream_query] LangGraph used, retrieved={len(retrieved)}, sources={len(sources)}"
             )
-            yield ChatStreamEvent(
-                type="retrieval",
-                data={
-                    "retrieved_chunks": [cid for cid, _ in retrieved],
-                    "count": len(retrieved),
-                },
-            )
-            yield ChatStreamEvent(
-                type="sources", data={"sources": [s.model_dump() for s in sources]}
-            )
-            print_debug(f"[RAGService.stream_query] citations_text={citations_text}")
             print_debug(
                 f"[RAGService.stream_query] Citations text built, length={len(citations_text)}"
             )
-            # Stream LLM tokens (simulate streaming)
-            for token in answer.split():
-                yield ChatStreamEvent(type="token", data={"text": token + " "})
+            # LLM lỗi/không stream → gửi câu fallback như một token duy nhất
+            if first_token_time is None and answer:
+                first_token_time = time.time()
+                yield ChatStreamEvent(type="token", data={"text": answer})
             print_success(f"[RAGService.stream_query] LLM streamed answer: {answer}")
-            print_success("[RAGService.stream_query] LLM streaming finished.")
+            if first_token_time is not None:
+                print_info(
+                    f"[RAGService.stream_query] Time to first token: {(first_token_time - start_time):.2f}s"
+                )
             total_time = time.time()
             print_info(
                 f"[RAGService.stream_query] Total time: {(total_time - start_time):.2f}s"
@@ -332,6 +438,8 @@ class RAGService:
                     retrieved_chunks=[cid for cid, _ in retrieved],
                     query_time_ms=(total_time - start_time) * 1000,
                     vector_search_time_ms=(vector_time - start_time) * 1000,
+                    context_tokens=state_out.get("context_tokens"),
+                    prompt_tokens=state_out.get("prompt_tokens"),
                 )
             num_citations = min(len(sources), RAG_TOP_K)
             response = ChatResponse(
@@ -340,6 +448,7 @@ class RAGService:
                 num_citations=num_citations,
                 debug=debug_info,
             )
+            self._store_answer_cache(cache_vec, response, answer_ok)
             try:
                 self.append_memory(session_id, question, answer)
             except Exception:
@@ -351,34 +460,188 @@ class RAGService:
 
     async def _search_vectors(self, question: str) -> List[Tuple[int, float]]:
         """Search for similar vectors in Qdrant and return list of (chunk_id, score)."""
+        hits = await self._search_hits(question)
+        return [(h.chunk_id, h.score) for h in hits]
+
+    async def _lookup_answer_cache(
+        self, question: str, session_id: Optional[str]
+    ) -> Tuple[Optional[List[float]], Optional[ChatResponse]]:
+        """Trả (embedding câu hỏi, ChatResponse cache) — chỉ dùng khi phiên chưa có memory."""
+        if not ANSWER_CACHE_ENABLED or self._get_memory_context(session_id):
+            return None, None
+        try:
+            # Embedding được EmbeddingCache giữ lại, _search_hits dùng lại không tốn thêm API call
+            vec = await self.embedding_provider.aembed_text(question)
+            return vec, get_answer_cache().lookup(vec)
+        except Exception as e:
+            print_warning(f"[RAGService] Answer cache lookup failed: {e}")
+            return None, None
+
+    @staticmethod
+    def _store_answer_cache(vec: Optional[List[float]], response: ChatResponse, answer_ok: bool) -> None:
+        # Chỉ lưu câu trả lời thật của model có nguồn (không lưu câu fallback khi LLM lỗi);
+        # vec None nghĩa là cache không áp dụng cho lượt này
+        if vec is None or not answer_ok or not response.sources:
+            return
+        get_answer_cache().store(vec, response)
+
+    @staticmethod
+    def _cached_debug_info(response: ChatResponse, start_time: float) -> ChatDebugInfo:
+        return ChatDebugInfo(
+            retrieved_chunks=[s.chunk_id for s in response.sources],
+            query_time_ms=(time.time() - start_time) * 1000,
+            vector_search_time_ms=0.0,
+            answer_cache_hit=True,
+        )
+
+    async def _search_hits(self, question: str) -> List[VectorHit]:
+        """Search Qdrant (+ BM25 khi bật hybrid), trả VectorHit (kèm payload khi bật QDRANT_PAYLOAD_DENORMALIZED)."""
+        lexical = self._search_lexical(question)
         try:
             # Embed question
-            query_vec = self.embedding_provider.embed_text(question)
-            # Search in Qdrant
-            results = self.vector_service.search(query_vector=query_vec)
-            return results
+            query_vec = await self.embedding_provider.aembed_text(question)
+            use_mmr = RAG_MMR_ENABLED and RAG_MMR_POOL_SIZE > RAG_TOP_K
+            # Search in Qdrant (pool lớn hơn + vector khi bật MMR hoặc cần trộn với BM25)
+            hits = await self.vector_service.search_hits(
+                query_vector=query_vec,
+                top_k=RAG_MMR_POOL_SIZE if use_mmr or lexical else RAG_TOP_K,
+                with_payload=QDRANT_PAYLOAD_DENORMALIZED,
+                with_vectors=use_mmr,
+            )
         except Exception as e:
             print_error(f"[_search_vectors] Vector search failed: {e}")
+            hits, query_vec, use_mmr = [], None, False
+        if use_mmr:
+            # Xếp lại cả pool theo MMR để RRF vẫn ưu tiên chunk đa dạng
+            hits = self._diversify(query_vec, hits, k=len(hits))
+        if lexical:
+            return self._fuse(hits, lexical)[:RAG_TOP_K]
+        return hits[:RAG_TOP_K]
+
+    def _search_lexical(self, question: str) -> List[Tuple[int, float]]:
+        """BM25 top pool; lỗi/tắt hybrid → [] (chỉ dùng vector search)."""
+        if self.lexical_index is None:
             return []
+        try:
+            return self.lexical_index.search(question, top_k=max(RAG_MMR_POOL_SIZE, RAG_TOP_K))
+        except Exception as e:
+            print_warning(f"[_search_lexical] BM25 search failed: {e}")
+            return []
+
+    @staticmethod
+    def _fuse(hits: List[VectorHit], lexical: List[Tuple[int, float]]) -> List[VectorHit]:
+        """Reciprocal rank fusion: rank_score = Σ 1/(RAG_RRF_K + rank) trên hai bảng xếp hạng."""
+        fused: Dict[int, float] = {}
+        for rank, h in enumerate(hits, start=1):
+            fused[h.chunk_id] = fused.get(h.chunk_id, 0.0) + 1.0 / (RAG_RRF_K + rank)
+        for rank, (cid, _) in enumerate(lexical, start=1):
+            fused[cid] = fused.get(cid, 0.0) + 1.0 / (RAG_RRF_K + rank)
+        by_id = {h.chunk_id: h for h in hits}
+        out: List[VectorHit] = []
+        for cid in sorted(fused, key=fused.get, reverse=True):
+            # Chunk chỉ có ở BM25 không có payload → node_context nạp riêng các chunk này từ MySQL
+            hit = by_id.get(cid) or VectorHit(chunk_id=cid, score=0.0, payload={})
+            # Giữ score cosine cho ChatSource.score; RRF chỉ dùng để xếp hạng
+            hit.rank_score = fused[cid]
+            out.append(hit)
+        print_debug(
+            f"[_fuse] vector={[h.chunk_id for h in hits[:RAG_TOP_K]]} bm25={[cid for cid, _ in lexical[:RAG_TOP_K]]} → {[h.chunk_id for h in out[:RAG_TOP_K]]}"
+        )
+        return out
+
+    @staticmethod
+    def _diversify(query_vec: List[float], hits: List[VectorHit], k: int = RAG_TOP_K) -> List[VectorHit]:
+        """MMR trên pool ứng viên → k hit theo thứ tự MMR, ít trùng lặp (chunk kề nhau do overlap)."""
+        if len(hits) <= 1 or any(h.vector is None for h in hits):
+            return hits[:k]
+        order = mmr_select(query_vec, [h.vector for h in hits], k, RAG_MMR_LAMBDA)
+        selected = [hits[i] for i in order]
+        print_debug(
+            f"[_diversify] MMR pool={len(hits)} → {[h.chunk_id for h in selected[:RAG_TOP_K]]} (top score: {[h.chunk_id for h in hits[:RAG_TOP_K]]})"
+        )
+        for h in selected:
+            h.vector = None  # không mang vector vào state LangGraph
+        return selected
+
+    async def _fill_missing_payloads(self, hits: List[VectorHit]) -> List[VectorHit]:
+        """Bổ sung payload cho hit thiếu chunk_text (chỉ BM25 tìm thấy) bằng một truy vấn IN; bỏ chunk không còn trong MySQL."""
+        missing = [h.chunk_id for h in hits if not h.payload.get("chunk_text")]
+        if not missing:
+            return hits
+        payloads = await asyncio.to_thread(self._load_payloads, missing)
+        print_debug(f"[_fill_missing_payloads] loaded {len(payloads)}/{len(missing)} payloads from MySQL")
+        filled: List[VectorHit] = []
+        for h in hits:
+            if not h.payload.get("chunk_text"):
+                if h.chunk_id not in payloads:
+                    continue
+                h.payload = payloads[h.chunk_id]
+            filled.append(h)
+        return filled
+
+    @staticmethod
+    def _load_payloads(chunk_ids: List[int]) -> Dict[int, Dict]:
+        """Payload denormalized (như lúc upsert) của các chunk, dựng từ MySQL."""
+        with Session(engine) as session:
+            statement = (
+                select(Chunk)
+                .where(Chunk.id.in_(chunk_ids))
+                .options(
+                    joinedload(Chunk.chapter).joinedload(Chapter.document),
+                    selectinload(Chunk.quotes),
+                )
+            )
+            return {
+                int(c.id): chunk_payload(
+                    document_id=c.chapter.document_id,
+                    chapter_id=c.chapter_id,
+                    chunk_id=c.id,
+                    chunk_index=c.chunk_index,
+                    created_at=c.created_at,
+                    chunk_text=c.chunk_text,
+                    chapter_title=c.chapter.title,
+                    document_title=c.chapter.document.title,
+                    page_number=c.quotes[0].page_number if c.quotes else None,
+                )
+                for c in session.exec(statement).unique().all()
+            }
 
     async def _get_context_from_chunks(
-        self, retrieved: List[Tuple[int, float]]
-    ) -> Tuple[List[ChatSource], str]:
-        """Get metadata and context text from MySQL using retrieved chunk IDs and scores"""
-        sources = []
-        context_parts = []
-        score_map: Dict[int, float] = {cid: score for cid, score in retrieved}
+        self, retrieved: List[Tuple[int, float]], priority: Optional[Dict[int, float]] = None
+    ) -> Tuple[List[ChatSource], str, Dict[int, Tuple[str, str]]]:
+        """Get sources, context text và tiêu đề trích dẫn từ MySQL theo thứ tự score Qdrant.
+
+        Một truy vấn JOIN chunk → chapter → document + một selectinload quotes (không N+1).
+        `priority` (chunk_id → rank_score RRF) thay score khi chọn chunk vào ngân sách context.
+        """
+        # Driver MySQL là sync → chạy trong thread để không chặn event loop
+        return await asyncio.to_thread(self._load_context_from_chunks, retrieved, priority)
+
+    def _load_context_from_chunks(
+        self, retrieved: List[Tuple[int, float]], priority: Optional[Dict[int, float]] = None
+    ) -> Tuple[List[ChatSource], str, Dict[int, Tuple[str, str]]]:
+        sources: List[ChatSource] = []
+        pieces: List[ContextPiece] = []
+        titles: Dict[int, Tuple[str, str]] = {}
+        if not retrieved:
+            return [], "", {}
 
         with Session(engine) as session:
-            # Query chunks with relationships
-            chunk_ids = list(score_map.keys())
-            if not chunk_ids:
-                return [], ""
-            statement = select(Chunk).where(Chunk.id.in_(chunk_ids))
-            chunks = session.exec(statement).all()
-
-            for chunk in chunks:
-                # Get chapter and document info
+            statement = (
+                select(Chunk)
+                .where(Chunk.id.in_([cid for cid, _ in retrieved]))
+                .options(
+                    joinedload(Chunk.chapter).joinedload(Chapter.document),
+                    selectinload(Chunk.quotes),
+                )
+            )
+            chunk_map = {c.id: c for c in session.exec(statement).unique().all()}
+
+            # Giữ thứ tự score của Qdrant (IN (...) không đảm bảo thứ tự)
+            for cid, score in retrieved:
+                chunk = chunk_map.get(cid)
+                if chunk is None:
+                    continue
                 chapter = chunk.chapter
                 document = chapter.document
 
@@ -395,20 +658,141 @@ class RAGService:
                     if chunk.quotes[0].quote_text:
                         text_snippet = chunk.quotes[0].quote_text
 
-                source = ChatSource(
-                    document_id=document.id,
-                    chapter_id=chapter.id,
-                    chunk_id=chunk.id,
-                    page_number=page_number,
+                sources.append(
+                    ChatSource(
+                        document_id=document.id,
+                        chapter_id=chapter.id,
+                        chunk_id=chunk.id,
+                        page_number=page_number,
+                        text=text_snippet,
+                        score=score,
+                        url=None,
+                    )
+                )
+                pieces.append(
+                    ContextPiece(
+                        key=len(sources) - 1,
+                        chapter_id=chapter.id,
+                        chunk_index=chunk.chunk_index,
+                        score=(priority or {}).get(cid, score),
+                        text=chunk.chunk_text,
+                    )
+                )
+                titles[chapter.id] = (document.title, chapter.title)
+
+        sources, context_text = self._assemble_context(sources, pieces)
+        return sources, context_text, titles
+
+    def _get_context_from_payloads(
+        self, hits: List[VectorHit]
+    ) -> Tuple[List[ChatSource], str, Dict[int, Tuple[str, str]]]:
+        """Dựng sources/context/tiêu đề trích dẫn trực tiếp từ payload Qdrant (0 truy vấn SQL)."""
+        sources: List[ChatSource] = []
+        pieces: List[ContextPiece] = []
+        titles: Dict[int, Tuple[str, str]] = {}
+        for h in hits:
+            p = h.payload
+            chunk_text = p.get("chunk_text") or ""
+            text_snippet = (
+                chunk_text[:300] + "..." if len(chunk_text) > 300 else chunk_text
+            )
+            chapter_id = int(p.get("chapter_id") or 0)
+            sources.append(
+                ChatSource(
+                    document_id=int(p.get("document_id") or 0),
+                    chapter_id=chapter_id,
+                    chunk_id=h.chunk_id,
+                    page_number=p.get("page_number"),
                     text=text_snippet,
-                    score=score_map.get(chunk.id),
+                    score=h.score,
                     url=None,
                 )
-                sources.append(source)
-                context_parts.append(chunk.chunk_text)
+            )
+            pieces.append(
+                ContextPiece(
+                    key=len(sources) - 1,
+                    chapter_id=chapter_id,
+                    chunk_index=int(p.get("chunk_index") or 0),
+                    score=h.rank_score if h.rank_score is not None else h.score,
+                    text=chunk_text,
+                )
+            )
+            titles[chapter_id] = (
+                p.get("document_title") or "Tài liệu",
+                p.get("chapter_title") or "Chương",
+            )
+        sources, context_text = self._assemble_context(sources, pieces)
+        return sources, context_text, titles
 
-        context_text = "\n\n".join(context_parts)
-        return sources, context_text
+    @staticmethod
+    def _assemble_context(
+        sources: List[ChatSource], pieces: List[ContextPiece]
+    ) -> Tuple[List[ChatSource], str]:
+        """Context trong RAG_CONTEXT_MAX_TOKENS; chỉ giữ source của chunk thực sự nằm trong context."""
+        keys, context_text, tokens = assemble_context(pieces, RAG_CONTEXT_MAX_TOKENS)
+        print_debug(
+            f"[_assemble_context] {len(keys)}/{len(pieces)} chunks, ~{tokens} tokens (budget {RAG_CONTEXT_MAX_TOKENS})"
+        )
+        return [sources[k] for k in keys], context_text
+
+    @staticmethod
+    def _prompt_tokens(question: str, context_text: str, citations_text: str, memory_text: str) -> int:
+        tokens = estimate_tokens(
+            build_prompt(
+                question=question,
+                context=context_text,
+                citations_text=citations_text,
+                memory_text=memory_text,
+            )
+        )
+        print_info(f"[RAGService] prompt ~{tokens} tokens")
+        return tokens
+
+    @staticmethod
+    def _format_citations(
+        sources: List[ChatSource], titles: Dict[int, Tuple[str, str]]
+    ) -> str:
+        """Format: - [doc_title] → [chapter] → trang? : trích đoạn ngắn."""
+        lines = []
+        for s in sources[:5]:
+            doc_title, ch_title = titles.get(s.chapter_id, ("Tài liệu", "Chương"))
+            page = f" → trang {s.page_number}" if s.page_number else ""
+            lines.append(f"- [{doc_title}] → [{ch_title}]{page}: {s.text[:120]}…")
+        return "\n".join(lines)
+
+    async def _stream_answer(
+        self,
+        question: str,
+        context: str,
+        citations_text: str = "",
+        memory_text: str = "",
+        outcome: Optional[Dict[str, bool]] = None,
+    ) -> AsyncIterator[str]:
+        """Stream token câu trả lời từ LLM; lỗi trước khi có token → trả câu fallback.
+
+        `outcome["ok"]` = True chỉ khi model stream trọn vẹn một câu trả lời không rỗng.
+        """
+        outcome = outcome if outcome is not None else {}
+        outcome["ok"] = False
+        emitted = False
+        try:
+            async for text in stream_answer(
+                question,
+                context,
+                citations_text=citations_text,
+                memory_text=memory_text,
+            ):
+                emitted = True
+                yield text
+        except Exception as e:
+            print_error(f"[_stream_answer] Exception: {e}")
+            if not emitted:
+                yield "Xin lỗi, hiện không thể kết nối LLM. Vui lòng thử lại sau."
+            return
+        if not emitted:
+            yield "Không tìm thấy trích dẫn phù hợp, vui lòng hỏi cụ thể hơn."
+            return
+        outcome["ok"] = True
 
     async def _generate_answer(
         self,
@@ -416,8 +800,11 @@ class RAGService:
         context: str,
         citations_text: str = "",
         memory_text: str = "",
-    ) -> str:
-        """Generate answer using LangChain chat model với persona + memory + citations"""
+    ) -> Tuple[str, bool]:
+        """Generate answer using LangChain chat model với persona + memory + citations.
+
+        Trả (answer, ok); ok=False khi answer là câu fallback (LLM lỗi/rỗng).
+        """
         print_info(f"[_generate_answer] Called with question='{question}'")
         print_debug(f"[_generate_answer] context (first 200 chars): {context[:200]}")
         print_debug(f"[_generate_answer] citations_text: {citations_text}")
@@ -436,13 +823,13 @@ class RAGService:
             print_debug(f"[_generate_answer] chat.ainvoke result: {result}")
             content = getattr(result, "content", str(result))
             print_success(f"[_generate_answer] content: {content}")
-            return (
-                content or "Không tìm thấy trích dẫn phù hợp, vui lòng hỏi cụ thể hơn."
-            )
+            if not content:
+                return "Không tìm thấy trích dẫn phù hợp, vui lòng hỏi cụ thể hơn.", False
+            return content, True
         except Exception as e:
             print_error(f"[_generate_answer] Exception: {e}")
             # Fallback: nếu LLM lỗi, trả câu trả lời ngắn
-            return "Xin lỗi, hiện không thể kết nối LLM. Vui lòng thử lại sau."
+            return "Xin lỗi, hiện không thể kết nối LLM. Vui lòng thử lại sau.", False
 
     # ===== Lightweight in-memory conversation (per process) =====
     _session_memory: Dict[str, List[str]] = {}
@@ -456,9 +843,9 @@ class RAGService:
         turns = self._session_memory.get(session_id, [])
         if not turns:
             return ""
-        # limit to last MEMORY_MAX_TURNS*2 lines (Q/A pairs)
+        # limit to last MEMORY_MAX_TURNS*2 lines (Q/A pairs), trong ngân sách token
         last = turns[-(MEMORY_MAX_TURNS * 2) :]
-        return "\n".join(last)
+        return cap_memory(last, RAG_MEMORY_MAX_TOKENS)
 
     def append_memory(
         self, session_id: Optional[str], user_utterance: str, assistant_reply: str
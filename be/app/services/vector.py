@@ -1,90 +1,445 @@
 """
 Qdrant vector service: ensure collection, upsert, and search.
+Có bản sync (ingest, CLI) và bản async (request path) dùng chung cấu hình kết nối.
 """
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field
+from datetime import datetime
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
     Distance,
     VectorParams,
+    HnswConfigDiff,
+    PayloadSchemaType,
+    SearchParams,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    VectorParamsDiff,
     PointStruct,
     Filter,
     FieldCondition,
     MatchAny,
     PointIdsList,
+    QueryRequest,
+    SetPayload,
+    SetPayloadOperation,
 )
 
+import threading
+
 from app.core.config import (
     QDRANT_HOST,
     QDRANT_PORT,
     QDRANT_API_KEY,
+    QDRANT_PREFER_GRPC,
+    QDRANT_GRPC_PORT,
     QDRANT_COLLECTION,
     QDRANT_DISTANCE,
+    QDRANT_HNSW_M,
+    QDRANT_HNSW_EF_CONSTRUCT,
+    QDRANT_HNSW_EF,
+    QDRANT_QUANTIZATION,
+    QDRANT_ON_DISK,
+    QDRANT_OVERSAMPLING,
+    QDRANT_RESCORE,
     EMBEDDING_DIM,
+    EMBEDDING_MODEL_ID,
     RAG_TOP_K,
+    QDRANT_PAYLOAD_DENORMALIZED,
 )
 import os
+import re
 from app.utils.color import print_info, print_warning, print_error
 
 
+@dataclass
+class VectorHit:
+    """Một kết quả search: chunk_id, score, payload (và vector nếu yêu cầu).
+
+    `rank_score` chỉ dùng để xếp hạng (RRF khi trộn BM25); `score` luôn là độ tương đồng vector (0 nếu chỉ BM25 tìm thấy).
+    """
+
+    chunk_id: int
+    score: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+    vector: Optional[List[float]] = None
+    rank_score: Optional[float] = None
+
+
+def chunk_payload(
+    document_id: int,
+    chapter_id: int,
+    chunk_id: int,
+    chunk_index: int,
+    created_at: datetime,
+    chunk_text: Optional[str] = None,
+    chapter_title: Optional[str] = None,
+    document_title: Optional[str] = None,
+    page_number: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Payload chuẩn cho một chunk; thêm trường denormalized khi bật QDRANT_PAYLOAD_DENORMALIZED."""
+    payload: Dict[str, Any] = {
+        "document_id": int(document_id),
+        "chapter_id": int(chapter_id),
+        "chunk_id": int(chunk_id),
+        "chunk_index": int(chunk_index),
+        "created_at": created_at.isoformat(),
+    }
+    if QDRANT_PAYLOAD_DENORMALIZED:
+        payload.update(denormalized_payload(chunk_text, chapter_title, document_title, page_number))
+    return payload
+
+
+def denormalized_payload(
+    chunk_text: Optional[str],
+    chapter_title: Optional[str],
+    document_title: Optional[str],
+    page_number: Optional[int],
+) -> Dict[str, Any]:
+    """Các trường đủ để dựng ChatSource/context trực tiếp từ kết quả search."""
+    return {
+        "chunk_text": chunk_text or "",
+        "chapter_title": chapter_title or "",
+        "document_title": document_title or "",
+        "page_number": page_number,
+    }
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    """Tham số kết nối chung cho QdrantClient/AsyncQdrantClient."""
+    # Ưu tiên: QDRANT_URL (đầy đủ http/https)
+    qdrant_url = os.getenv("QDRANT_URL", "").strip()
+    host_value = str(QDRANT_HOST or "").strip()
+    transport = {"prefer_grpc": QDRANT_PREFER_GRPC, "grpc_port": QDRANT_GRPC_PORT}
+    if qdrant_url:
+        return {"url": qdrant_url, "api_key": QDRANT_API_KEY, **transport}
+    if host_value.startswith("http://") or host_value.startswith("https://"):
+        return {"url": host_value, "api_key": QDRANT_API_KEY, **transport}
+    # Fallback: host/port (thường 6333 là HTTP)
+    return {"host": host_value or None, "port": QDRANT_PORT, "api_key": QDRANT_API_KEY, **transport}
+
+
+_client: Optional[QdrantClient] = None
+_async_client: Optional[AsyncQdrantClient] = None
+_client_lock = threading.Lock()
+
+
+def get_qdrant_client() -> QdrantClient:
+    """QdrantClient dùng chung cho cả process (một connection pool HTTP/gRPC)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = QdrantClient(**_client_kwargs())
+                except Exception as e:
+                    print_error(f"[Qdrant] Init client failed: {e}")
+                    raise
+                print_info(f"[Qdrant] client ready (prefer_grpc={QDRANT_PREFER_GRPC})")
+    return _client
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """AsyncQdrantClient dùng chung cho request path."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                try:
+                    _async_client = AsyncQdrantClient(**_client_kwargs())
+                except Exception as e:
+                    print_error(f"[Qdrant] Init async client failed: {e}")
+                    raise
+    return _async_client
+
+
+async def close_qdrant_clients() -> None:
+    """Đóng client dùng chung (gọi khi tắt app)."""
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client, _async_client = None, None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
+
+
+class EmbeddingModelMismatchError(RuntimeError):
+    """Collection được build bằng embedding model/dim khác với EMBEDDING_MODEL_ID/EMBEDDING_DIM của process."""
+
+
+def model_tag(model_id: str = EMBEDDING_MODEL_ID, dim: int = EMBEDDING_DIM) -> str:
+    """Nhãn model gắn vào tên collection: 'text-embedding-004', 768 → 'text_embedding_004_d768'."""
+    return f"{re.sub(r'[^a-z0-9]+', '_', model_id.lower()).strip('_')}_d{int(dim)}"
+
+
+def versioned_collection_name(alias: str, version: str, tag: Optional[str] = None) -> str:
+    """Tên collection reindex: <alias>__<model tag>__v<version>."""
+    return f"{alias}__{tag or model_tag()}__v{version}"
+
+
+def collection_model_tag(collection_name: str) -> Optional[str]:
+    """Model tag trong tên collection; None với collection cũ không gắn nhãn."""
+    parts = collection_name.split("__")
+    return parts[1] if len(parts) >= 3 else None
+
+
+def collection_dim(client: QdrantClient, collection_name: str) -> Optional[int]:
+    vectors = client.get_collection(collection_name).config.params.vectors
+    return getattr(vectors, "size", None)
+
+
+def check_embedding_model(client: QdrantClient, collection_name: str) -> None:
+    """Raise EmbeddingModelMismatchError nếu collection không khớp model/dim hiện tại."""
+    tag = collection_model_tag(collection_name)
+    if tag is not None and tag != model_tag():
+        raise EmbeddingModelMismatchError(f"{collection_name} built for {tag}, process embeds with {model_tag()}")
+    dim = collection_dim(client, collection_name)
+    if dim is not None and dim != EMBEDDING_DIM:
+        raise EmbeddingModelMismatchError(f"{collection_name} has dim={dim}, EMBEDDING_DIM={EMBEDDING_DIM}")
+
+
+def latest_model_collection(client: QdrantClient, alias: str = QDRANT_COLLECTION, tag: Optional[str] = None) -> Optional[str]:
+    """Collection reindex mới nhất build cho model tag (mặc định: model hiện tại)."""
+    prefix = f"{alias}__{tag or model_tag()}__v"
+    names = [c.name for c in client.get_collections().collections if c.name.startswith(prefix)]
+    return max(names) if names else None
+
+
+_active_collection: Optional[str] = None
+
+
+def active_collection() -> str:
+    """Collection mà process này đọc/ghi, khớp với embedding model đang dùng (resolve một lần/process).
+
+    Alias QDRANT_COLLECTION trỏ tới collection cùng model → dùng alias. Alias còn trỏ collection model cũ
+    (đang reindex hai pha) → dùng thẳng collection mới nhất của model hiện tại. Không có → raise.
+    Qdrant lỗi → tạm dùng alias, lần sau resolve lại.
+    """
+    global _active_collection
+    if _active_collection is not None:
+        return _active_collection
+    client = get_qdrant_client()
+    try:
+        target = QDRANT_COLLECTION
+        for a in client.get_aliases().aliases:
+            if a.alias_name == QDRANT_COLLECTION:
+                target = a.collection_name
+        resolved = QDRANT_COLLECTION
+        if client.collection_exists(target):
+            try:
+                check_embedding_model(client, target)
+            except EmbeddingModelMismatchError as e:
+                resolved = latest_model_collection(client)
+                if resolved is None:
+                    raise
+                print_warning(f"[Qdrant] {e}; using {resolved} until the alias is switched")
+    except EmbeddingModelMismatchError:
+        raise
+    except Exception as e:
+        print_warning(f"[Qdrant] resolve collection failed, using {QDRANT_COLLECTION}: {e}")
+        return QDRANT_COLLECTION
+    _active_collection = resolved
+    return resolved
+
+
+# Payload index cho các key dùng trong filter (/docs/search?doc_id=…&chapter_id=…)
+PAYLOAD_INDEXES: Dict[str, PayloadSchemaType] = {
+    "document_id": PayloadSchemaType.INTEGER,
+    "chapter_id": PayloadSchemaType.INTEGER,
+    "created_at": PayloadSchemaType.DATETIME,
+}
+
+
+def quantization_config(profile: Optional[str] = None) -> Any:
+    """Quantization theo profile (none/scalar/binary); None nghĩa là không lượng tử hoá."""
+    profile = (profile or QDRANT_QUANTIZATION or "none").lower()
+    if profile == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if profile == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    if profile != "none":
+        print_warning(f"[Qdrant] Unknown QDRANT_QUANTIZATION={profile}, using none")
+    return None
+
+
+def search_params(profile: Optional[str] = None) -> Optional[SearchParams]:
+    """Search params theo config: hnsw_ef và oversampling/rescore khi collection lượng tử hoá."""
+    quantization = None
+    if (profile or QDRANT_QUANTIZATION or "none").lower() in {"scalar", "binary"}:
+        # Search trên bản lượng tử hoá lấy top_k*oversampling ứng viên, rồi rescore bằng vector gốc
+        quantization = QuantizationSearchParams(rescore=QDRANT_RESCORE, oversampling=QDRANT_OVERSAMPLING)
+    if QDRANT_HNSW_EF <= 0 and quantization is None:
+        return None
+    return SearchParams(hnsw_ef=QDRANT_HNSW_EF if QDRANT_HNSW_EF > 0 else None, quantization=quantization)
+
+
+@dataclass
+class VectorQuery:
+    """Một truy vấn trong search_batch: vector + filter/top_k riêng."""
+
+    vector: List[float]
+    top_k: Optional[int] = None
+    document_ids: Optional[List[int]] = None
+    chapter_ids: Optional[List[int]] = None
+
+
+def _query_requests(
+    queries: List[VectorQuery], with_payload: bool, with_vectors: bool
+) -> List[QueryRequest]:
+    return [
+        QueryRequest(
+            query=q.vector,
+            limit=q.top_k or RAG_TOP_K,
+            filter=_build_filter(q.document_ids, q.chapter_ids),
+            params=search_params(),
+            with_payload=with_payload,
+            with_vector=with_vectors,
+        )
+        for q in queries
+    ]
+
+
+def _build_filter(
+    document_ids: Optional[List[int]], chapter_ids: Optional[List[int]]
+) -> Optional[Filter]:
+    must_conditions: List[Any] = []
+    if document_ids:
+        must_conditions.append(
+            FieldCondition(key="document_id", match=MatchAny(any=document_ids))
+        )
+    if chapter_ids:
+        must_conditions.append(
+            FieldCondition(key="chapter_id", match=MatchAny(any=chapter_ids))
+        )
+    return Filter(must=must_conditions) if must_conditions else None
+
+
+def _to_hits(points: Iterable[Any], with_vectors: bool) -> List[VectorHit]:
+    return [
+        VectorHit(
+            chunk_id=int(r.id),
+            score=float(r.score),
+            payload=dict(r.payload or {}),
+            vector=list(r.vector) if with_vectors and r.vector is not None else None,
+        )
+        for r in points
+    ]
+
+
+def _set_payload_operations(payloads: Dict[int, Dict[str, Any]]) -> List[SetPayloadOperation]:
+    return [
+        SetPayloadOperation(set_payload=SetPayload(payload=payload, points=[int(pid)]))
+        for pid, payload in payloads.items()
+    ]
+
+
 # TODO: remove api_key
 class QdrantVectorService:
     """Encapsulates Qdrant operations"""
 
-    def __init__(self) -> None:
-        # Ưu tiên: QDRANT_URL (đầy đủ http/https)
-        qdrant_url = os.getenv("QDRANT_URL", "").strip()
-        host_value = str(QDRANT_HOST or "").strip()
-        try:
-            if qdrant_url:
-                self.client = QdrantClient(
-                    url=qdrant_url,
-                    api_key=QDRANT_API_KEY,
-                )
-            elif host_value.startswith("http://") or host_value.startswith("https://"):
-                self.client = QdrantClient(
-                    url=host_value,
-                    api_key=QDRANT_API_KEY,
-                )
-            else:
-                # Fallback: host/port (thường 6333 là HTTP)
-                self.client = QdrantClient(
-                    host=host_value or None,
-                    port=QDRANT_PORT,
-                    api_key=QDRANT_API_KEY,
-                )
-        except Exception as e:
-            print_error(f"[Qdrant] Init client failed: {e}")
-            raise
+    def __init__(self, client: Optional[QdrantClient] = None, collection: Optional[str] = None) -> None:
+        # Dùng client chung của process → khởi tạo service rẻ, không mở kết nối mới
+        self.client = client or get_qdrant_client()
+        self.collection = collection or active_collection()
 
-        # Chẩn đoán kết nối: in danh sách collections (không chặn luồng nếu lỗi)
+    def check_ready(self) -> bool:
+        """Chẩn đoán kết nối một lần lúc startup: in danh sách collections (không raise)."""
         try:
             cols = self.client.get_collections()
-            print_info(f"[Qdrant] get_collections: {cols}")
+            print_info(f"[Qdrant] get_collections: {[c.name for c in cols.collections]}")
+            return True
         except Exception as e:
             print_warning(f"[Qdrant] get_collections failed: {e}")
-        self.collection = QDRANT_COLLECTION
+            return False
 
     def ensure_collection(self) -> None:
-        """Ensure the collection exists with correct vector params"""
+        """Ensure the collection exists with correct vector params, HNSW config và payload indexes"""
         try:
-            exists = self.client.collection_exists(self.collection)
+            # QDRANT_COLLECTION có thể là alias (reindex blue/green) → thao tác trên collection thật phía sau
+            target = self.resolve_collection()
+            exists = self.client.collection_exists(target)
         except Exception:
-            exists = False
+            target, exists = self.collection, False
 
         if not exists:
-            # Normalize distance name to Qdrant enum
-            distance_name = (QDRANT_DISTANCE or "Cosine").upper()
-            if distance_name not in {"COSINE", "DOT", "EUCLID"}:
-                distance_name = "COSINE"
-            distance = getattr(Distance, distance_name)
-            self.client.recreate_collection(
-                collection_name=self.collection,
-                vectors_config=VectorParams(size=EMBEDDING_DIM, distance=distance),
+            # create (không recreate): lỗi collection_exists tạm thời không được phép xoá dữ liệu
+            self.create_collection(self.collection)
+            return
+        # Collection của model/dim khác → từ chối ghi vector lệch không gian
+        check_embedding_model(self.client, target)
+        info = self.client.get_collection(target)
+        current = info.config.hnsw_config
+        if (current.m, current.ef_construct) != (QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT):
+            print_info(
+                f"[Qdrant] update HNSW m={QDRANT_HNSW_M} ef_construct={QDRANT_HNSW_EF_CONSTRUCT} "
+                f"(was m={current.m} ef_construct={current.ef_construct})"
+            )
+            self.client.update_collection(
+                collection_name=target,
+                hnsw_config=HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT),
+            )
+        self.ensure_payload_indexes(info.payload_schema, collection_name=target)
+
+    def create_collection(self, collection_name: str) -> None:
+        """Tạo collection mới theo config hiện tại (dim, distance, HNSW, storage profile) + payload indexes."""
+        # Normalize distance name to Qdrant enum
+        distance_name = (QDRANT_DISTANCE or "Cosine").upper()
+        if distance_name not in {"COSINE", "DOT", "EUCLID"}:
+            distance_name = "COSINE"
+        distance = getattr(Distance, distance_name)
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(size=EMBEDDING_DIM, distance=distance, on_disk=QDRANT_ON_DISK),
+            hnsw_config=HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT),
+            quantization_config=quantization_config(),
+        )
+        self.ensure_payload_indexes({}, collection_name=collection_name)
+
+    def resolve_collection(self) -> str:
+        """Tên collection thật mà self.collection (alias hoặc collection) đang trỏ tới."""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.collection:
+                return alias.collection_name
+        return self.collection
+
+    def apply_storage_profile(self, profile: Optional[str] = None, on_disk: Optional[bool] = None) -> None:
+        """Đổi quantization/on_disk của collection đã có; Qdrant tối ưu lại segment ở nền, vẫn search được."""
+        quantization = quantization_config(profile)
+        self.client.update_collection(
+            collection_name=self.resolve_collection(),
+            vectors_config={"": VectorParamsDiff(on_disk=QDRANT_ON_DISK if on_disk is None else on_disk)},
+            quantization_config=quantization if quantization is not None else Disabled.DISABLED,
+        )
+
+    def ensure_payload_indexes(
+        self, existing: Optional[Dict[str, Any]] = None, collection_name: Optional[str] = None
+    ) -> None:
+        """Tạo payload index còn thiếu (integer cho document_id/chapter_id, datetime cho created_at)."""
+        collection_name = collection_name or self.collection
+        if existing is None:
+            existing = self.client.get_collection(collection_name).payload_schema
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name in (existing or {}):
+                continue
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=schema,
             )
+            print_info(f"[Qdrant] created payload index {collection_name}.{field_name} ({schema.value})")
 
     def upsert_points(
         self,
@@ -110,6 +465,14 @@ class QdrantVectorService:
             points_selector=PointIdsList(points=[int(i) for i in ids]),
         )
 
+    def set_payloads(self, payloads: Dict[int, Dict[str, Any]]) -> None:
+        """Merge payload riêng cho từng point trong một request (batch_update_points)."""
+        if not payloads:
+            return
+        self.client.batch_update_points(
+            collection_name=self.collection, update_operations=_set_payload_operations(payloads)
+        )
+
     def search(
         self,
         query_vector: List[float],
@@ -121,32 +484,133 @@ class QdrantVectorService:
 
         Returns list of (chunk_id, score)
         """
-        top_k_final = top_k or RAG_TOP_K
-        query_filter = None
-        must_conditions: List[Any] = []
-        if document_ids:
-            must_conditions.append(
-                FieldCondition(key="document_id", match=MatchAny(any=document_ids))
-            )
-        if chapter_ids:
-            must_conditions.append(
-                FieldCondition(key="chapter_id", match=MatchAny(any=chapter_ids))
+        hits = self.search_hits(
+            query_vector,
+            top_k=top_k,
+            document_ids=document_ids,
+            chapter_ids=chapter_ids,
+            with_payload=False,
+        )
+        return [(h.chunk_id, h.score) for h in hits]
+
+    def search_hits(
+        self,
+        query_vector: List[float],
+        top_k: Optional[int] = None,
+        document_ids: Optional[List[int]] = None,
+        chapter_ids: Optional[List[int]] = None,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+    ) -> List[VectorHit]:
+        """Search như `search` nhưng trả VectorHit kèm payload/vector."""
+        response = self.client.query_points(
+            collection_name=self.collection,
+            query=query_vector,
+            limit=top_k or RAG_TOP_K,
+            query_filter=_build_filter(document_ids, chapter_ids),
+            search_params=search_params(),
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+        return _to_hits(response.points, with_vectors)
+
+    def search_batch(
+        self,
+        queries: List[VectorQuery],
+        with_payload: bool = False,
+        with_vectors: bool = False,
+    ) -> List[List[VectorHit]]:
+        """Nhiều query vector (filter/top_k riêng) trong một request query_batch_points; giữ thứ tự input."""
+        if not queries:
+            return []
+        responses = self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=_query_requests(queries, with_payload, with_vectors),
+        )
+        return [_to_hits(r.points, with_vectors) for r in responses]
+
+
+class AsyncQdrantVectorService:
+    """Bản async của QdrantVectorService cho request path (AsyncQdrantClient, connection pool dùng chung)."""
+
+    def __init__(self, client: Optional[AsyncQdrantClient] = None) -> None:
+        self.client = client or get_async_qdrant_client()
+        self.collection = active_collection()
+
+    async def upsert_points(
+        self,
+        ids: Iterable[int],
+        vectors: Iterable[List[float]],
+        payloads: Iterable[Dict[str, Any]],
+    ) -> None:
+        points = [
+            PointStruct(id=int(pid), vector=vec, payload=payload)
+            for pid, vec, payload in zip(ids, vectors, payloads)
+        ]
+        if points:
+            await self.client.upsert(collection_name=self.collection, points=points)
+
+    async def delete_points_by_ids(self, ids: List[int]) -> None:
+        if not ids:
+            return
+        await self.client.delete(
+            collection_name=self.collection,
+            points_selector=PointIdsList(points=[int(i) for i in ids]),
+        )
+
+    async def set_payloads(self, payloads: Dict[int, Dict[str, Any]]) -> None:
+        if payloads:
+            await self.client.batch_update_points(
+                collection_name=self.collection, update_operations=_set_payload_operations(payloads)
             )
-        if must_conditions:
-            query_filter = Filter(must=must_conditions)
 
-        results = self.client.search(
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: Optional[int] = None,
+        document_ids: Optional[List[int]] = None,
+        chapter_ids: Optional[List[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """Returns list of (chunk_id, score)"""
+        hits = await self.search_hits(
+            query_vector,
+            top_k=top_k,
+            document_ids=document_ids,
+            chapter_ids=chapter_ids,
+            with_payload=False,
+        )
+        return [(h.chunk_id, h.score) for h in hits]
+
+    async def search_hits(
+        self,
+        query_vector: List[float],
+        top_k: Optional[int] = None,
+        document_ids: Optional[List[int]] = None,
+        chapter_ids: Optional[List[int]] = None,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+    ) -> List[VectorHit]:
+        response = await self.client.query_points(
             collection_name=self.collection,
-            query_vector=query_vector,
-            limit=top_k_final,
-            query_filter=query_filter,
-            with_payload=True,
-            with_vectors=False,
-        )
-
-        out: List[Tuple[int, float]] = []
-        for r in results:
-            point_id = int(r.id)
-            score = float(r.score)
-            out.append((point_id, score))
-        return out
+            query=query_vector,
+            limit=top_k or RAG_TOP_K,
+            query_filter=_build_filter(document_ids, chapter_ids),
+            search_params=search_params(),
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+        return _to_hits(response.points, with_vectors)
+
+    async def search_batch(
+        self,
+        queries: List[VectorQuery],
+        with_payload: bool = False,
+        with_vectors: bool = False,
+    ) -> List[List[VectorHit]]:
+        if not queries:
+            return []
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=_query_requests(queries, with_payload, with_vectors),
+        )
+        return [_to_hits(r.points, with_vectors) for r in responses]
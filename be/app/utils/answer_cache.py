@@ -0,0 +1,129 @@
+"""
+Semantic answer cache cho chat.
+Tra ChatResponse theo cosine giữa embedding câu hỏi mới và câu hỏi đã trả lời (TTL + LRU).
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    ANSWER_CACHE_MAX_SIZE,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_THRESHOLD,
+)
+from app.schemas.common_types import ChatResponse
+from app.utils.color import print_debug
+
+
+class SemanticAnswerCache:
+    """LRU các cặp (embedding chuẩn hoá, ChatResponse); hit khi cosine ≥ threshold và chưa hết TTL."""
+
+    def __init__(
+        self,
+        max_size: int = ANSWER_CACHE_MAX_SIZE,
+        ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+    ) -> None:
+        self.max_size = max(1, int(max_size))
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, ChatResponse, float]]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        # Ma trận (n, dim) dựng lười từ _entries để so khớp vector hoá
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[int] = []
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, vector: List[float]) -> Optional[ChatResponse]:
+        """Trả bản sao ChatResponse của câu hỏi gần nhất nếu đủ giống."""
+        q = _normalize(vector)
+        if q is None:
+            return None
+        with self._lock:
+            self._expire()
+            if not self._entries:
+                self.misses += 1
+                return None
+            matrix, keys = self._get_matrix()
+            if matrix.shape[1] != q.shape[0]:
+                self.misses += 1
+                return None
+            sims = matrix @ q
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.threshold:
+                self.misses += 1
+                return None
+            key = keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            print_debug(f"[SemanticAnswerCache] hit cosine={float(sims[best]):.4f}")
+            return self._entries[key][1].model_copy(deep=True)
+
+    def store(self, vector: List[float], response: ChatResponse) -> None:
+        q = _normalize(vector)
+        if q is None:
+            return
+        with self._lock:
+            self._entries[next(self._ids)] = (q, response.model_copy(deep=True, update={"debug": None}), time.time())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self) -> None:
+        """Xoá toàn bộ (gọi khi corpus thay đổi).
+
+        Chỉ xoá cache của process hiện tại: worker khác vẫn trả câu trả lời cũ tới khi entry hết TTL.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _expire(self) -> None:
+        # Caller giữ self._lock; TTL tính từ lúc lưu (thứ tự LRU không phản ánh tuổi entry)
+        now = time.time()
+        expired = [k for k, (_, _, ts) in self._entries.items() if now - ts > self.ttl_seconds]
+        for k in expired:
+            self._entries.pop(k, None)
+        if expired:
+            self._matrix = None
+
+    def _get_matrix(self) -> Tuple[np.ndarray, List[int]]:
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[k][0] for k in self._matrix_keys])
+        return self._matrix, self._matrix_keys
+
+
+def _normalize(vector: List[float]) -> Optional[np.ndarray]:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    if arr.ndim != 1 or norm == 0.0:
+        return None
+    return arr / norm
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Singleton cache cho cả process (RAGService đọc/ghi, CorpusService invalidate)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticAnswerCache()
+    return _cache
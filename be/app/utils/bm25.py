@@ -0,0 +1,280 @@
+"""
+BM25 inverted index trong process cho Chunk.chunk_text (nhánh lexical của hybrid search).
+Token hoá bỏ dấu tiếng Việt (đ→d) + bigram âm tiết để khớp cụm từ, tên riêng, ngày tháng.
+Posting list là array('q') (append rẻ); trọng số BM25 của mỗi term (mảng NumPy) tính một lần rồi dùng lại tới khi index đổi.
+Xoá chunk đánh dấu tombstone rồi compact định kỳ.
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import BM25_INDEX_PATH
+from app.utils.color import print_info, print_warning
+
+_TOKEN_RE = re.compile(r"\w+")
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]")
+_STATE_VERSION = 1
+# Số term giữ mảng NumPy đã dựng sẵn; vượt thì xoá hết (term hay hỏi sẽ được dựng lại ngay)
+_TERM_CACHE_MAX = 50_000
+
+
+def fold_diacritics(text: str) -> str:
+    """Lowercase + bỏ dấu tiếng Việt: 'Đảng Cộng sản' → 'dang cong san'."""
+    text = (text or "").lower().replace("đ", "d")
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFD", text))
+
+
+def tokenize(text: str) -> List[str]:
+    """Âm tiết đã bỏ dấu + bigram âm tiết liền kề ('ho chi', 'chi minh')."""
+    syllables = _TOKEN_RE.findall(fold_diacritics(text))
+    return syllables + [f"{a} {b}" for a, b in zip(syllables, syllables[1:])]
+
+
+class BM25Index:
+    """Okapi BM25 cập nhật tăng dần theo chunk_id; thread-safe.
+
+    Mỗi term một array('q') posting, mỗi phần tử = slot << 8 | tf (tf tối đa 255).
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # slot: vị trí nội bộ của chunk trong posting list (không đổi cho tới lần compact)
+        self._slot_of: Dict[int, int] = {}
+        self._chunk_ids = array("q")
+        self._doc_len = array("f")
+        self._alive = array("b")
+        self._postings: Dict[str, array] = {}
+        self._total_len = 0
+        self._dead = 0
+        self._clear_cache()
+
+    def _clear_cache(self) -> None:
+        # term → (slots còn sống, trọng số BM25); idf/avgdl đổi theo mọi thêm/xoá nên xoá cả cache khi index đổi
+        self._term_cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_len_np: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def add_many(self, items: Iterable[Tuple[int, str]]) -> None:
+        """Thêm/ghi đè các (chunk_id, text)."""
+        with self._lock:
+            for chunk_id, text in items:
+                self._remove_locked(int(chunk_id))
+                self._add_locked(int(chunk_id), text)
+            self._clear_cache()
+
+    def remove_many(self, chunk_ids: Iterable[int]) -> int:
+        with self._lock:
+            removed = sum(self._remove_locked(int(cid)) for cid in chunk_ids)
+            if removed:
+                self._clear_cache()
+            if self._dead > 1000 and self._dead > len(self._alive) // 3:
+                self._compact_locked()
+            return removed
+
+    def _add_locked(self, chunk_id: int, text: str) -> None:
+        tokens = tokenize(text)
+        slot = len(self._chunk_ids)
+        self._slot_of[chunk_id] = slot
+        self._chunk_ids.append(chunk_id)
+        self._doc_len.append(len(tokens))
+        self._alive.append(1)
+        postings = self._postings
+        base = slot << 8
+        for term, count in Counter(tokens).items():
+            posting = postings.get(term)
+            if posting is None:
+                posting = postings[term] = array("q")
+            posting.append(base | min(count, 255))
+        self._total_len += len(tokens)
+
+    def _remove_locked(self, chunk_id: int) -> bool:
+        # Tombstone: posting giữ nguyên, slot bị loại khi chấm điểm và khi compact
+        slot = self._slot_of.pop(chunk_id, None)
+        if slot is None:
+            return False
+        self._alive[slot] = 0
+        self._total_len -= int(self._doc_len[slot])
+        self._dead += 1
+        return True
+
+    def _compact_locked(self) -> None:
+        """Dựng lại posting list bỏ slot đã xoá."""
+        alive = np.array(self._alive, dtype=bool)
+        new_slot = np.cumsum(alive, dtype=np.int64) - 1
+        postings: Dict[str, array] = {}
+        for term, posting in self._postings.items():
+            packed = np.array(posting, dtype=np.int64)
+            slots = packed >> 8
+            keep = alive[slots]
+            if keep.any():
+                postings[term] = array("q", ((new_slot[slots[keep]] << 8) | (packed[keep] & 0xFF)).tobytes())
+        self._postings = postings
+        self._chunk_ids = array("q", np.array(self._chunk_ids, dtype=np.int64)[alive].tobytes())
+        self._doc_len = array("f", np.array(self._doc_len, dtype=np.float32)[alive].tobytes())
+        self._alive = array("b", bytes([1]) * len(self._chunk_ids))
+        self._slot_of = {int(cid): i for i, cid in enumerate(self._chunk_ids)}
+        self._dead = 0
+        self._clear_cache()
+
+    def _term_weights(self, term: str, n_docs: int, avgdl: float) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(slots còn sống, idf·tf·(k1+1)/(tf+norm)) của term; tính một lần rồi cache tới khi index đổi. Caller giữ lock."""
+        cached = self._term_cache.get(term)
+        if cached is not None:
+            return cached
+        posting = self._postings.get(term)
+        if posting is None:
+            return None
+        # copy(): không giữ buffer export, array('q') vẫn append được
+        packed = np.frombuffer(posting, dtype=np.int64).copy()
+        slots = packed >> 8
+        if self._dead:
+            keep = np.frombuffer(self._alive, dtype=np.int8)[slots] != 0
+            slots, packed = slots[keep], packed[keep]
+        if self._doc_len_np is None:
+            self._doc_len_np = np.frombuffer(self._doc_len, dtype=np.float32).copy()
+        df = len(slots)
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        tf = (packed & 0xFF).astype(np.float32)
+        norm = self.k1 * (1.0 - self.b + self.b * self._doc_len_np[slots] / avgdl)
+        cached = (slots, (idf * tf * (self.k1 + 1.0) / (tf + norm)).astype(np.float32))
+        if len(self._term_cache) >= _TERM_CACHE_MAX:
+            self._term_cache = {}
+        self._term_cache[term] = cached
+        return cached
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """Top-k (chunk_id, bm25 score) giảm dần; câu hỏi không có term nào trong index → []."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._slot_of)
+            if not n_docs or not terms:
+                return []
+            avgdl = self._total_len / n_docs
+            scores = np.zeros(len(self._chunk_ids), dtype=np.float32)
+            for term in terms:
+                weights = self._term_weights(term, n_docs, avgdl)
+                if weights is not None:
+                    scores[weights[0]] += weights[1]
+            candidates = np.flatnonzero(scores > 0)
+            if not len(candidates):
+                return []
+            k = min(top_k, len(candidates))
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self._chunk_ids[i]), float(scores[i])) for i in top]
+
+    def save(self, path: str) -> None:
+        """Ghi pickle dạng phẳng (terms + offsets + một mảng posting) ra file tạm rồi os.replace."""
+        with self._lock:
+            if self._dead:
+                self._compact_locked()
+            terms = list(self._postings)
+            lengths = np.fromiter((len(self._postings[t]) for t in terms), dtype=np.int64, count=len(terms))
+            flat = array("q")
+            for t in terms:
+                flat.extend(self._postings[t])
+            state = {
+                "version": _STATE_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "chunk_ids": self._chunk_ids.tobytes(),
+                "doc_len": self._doc_len.tobytes(),
+                "terms": terms,
+                "lengths": lengths.tobytes(),
+                "postings": flat.tobytes(),
+            }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> None:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != _STATE_VERSION:
+            raise ValueError(f"unsupported BM25 index version {state.get('version')}")
+        chunk_ids = array("q", state["chunk_ids"])
+        doc_len = array("f", state["doc_len"])
+        raw = state["postings"]
+        ends = np.cumsum(np.frombuffer(state["lengths"], dtype=np.int64) * 8).tolist()
+        postings = {t: array("q", raw[start:end]) for t, start, end in zip(state["terms"], [0] + ends, ends)}
+        with self._lock:
+            self._reset()
+            self.k1, self.b = state["k1"], state["b"]
+            self._chunk_ids, self._doc_len, self._postings = chunk_ids, doc_len, postings
+            self._alive = array("b", bytes([1]) * len(chunk_ids))
+            self._slot_of = {int(cid): i for i, cid in enumerate(chunk_ids)}
+            self._total_len = int(sum(doc_len))
+
+
+class PersistentBM25Index(BM25Index):
+    """BM25Index gắn với file trên đĩa; tự nạp lại khi process khác (worker/CLI build) ghi file mới."""
+
+    def __init__(self, path: str = BM25_INDEX_PATH) -> None:
+        super().__init__()
+        self.path = path
+        self._loaded_mtime: Optional[float] = None
+        # True khi index phản ánh cả corpus (nạp được từ file hoặc đã ghi file); False → chỉ có thay đổi từ lúc khởi động
+        self.has_base = False
+        self._reload_lock = threading.Lock()
+        self.maybe_reload()
+
+    def maybe_reload(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        with self._reload_lock:
+            if mtime == self._loaded_mtime:
+                return
+            try:
+                self.load(self.path)
+                self.has_base = True
+            except Exception as e:
+                print_warning(f"[BM25] load {self.path} failed: {e}")
+            self._loaded_mtime = mtime
+            print_info(f"[BM25] loaded {len(self)} chunks from {self.path}")
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        self.maybe_reload()
+        return super().search(query, top_k)
+
+    def persist(self) -> None:
+        with self._reload_lock:
+            self.save(self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime
+            self.has_base = True
+
+
+_index: Optional[PersistentBM25Index] = None
+_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> PersistentBM25Index:
+    """Singleton cho cả process (RAGService search, CorpusService cập nhật khi upload/xoá)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PersistentBM25Index()
+    return _index
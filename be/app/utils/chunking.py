@@ -6,13 +6,22 @@ PDF/DOCX → text thô → chương (naive) → chunks (~600 tokens, naive theo
 
 from __future__ import annotations
 
-from typing import List, Tuple
+from array import array
+from bisect import bisect_right
+from concurrent.futures import Executor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import hashlib
+import math
 import re
 import os
+import time
+import unicodedata
 
 # Thêm import từ color.py để debug/log
-from app.utils.color import print_debug, print_error
+from app.utils.color import print_error, print_info
+from app.core.config import PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES
+from app.workers.pdf_pages import extract_page_range, pdf_page_count
 
 # Tuỳ chọn: vô hiệu hoá verify SSL trong môi trường DEV để tránh lỗi SSL khi
 # các thư viện phụ trợ thực hiện kết nối mạng nội bộ (nếu có).
@@ -21,113 +30,144 @@ if os.getenv("DEV_DISABLE_SSL_VERIFY", "false").lower() in {"1", "true", "yes"}:
     os.environ.setdefault("REQUESTS_CA_BUNDLE", "")
     os.environ.setdefault("PYTHONHTTPSVERIFY", "0")
 
-try:
-    from pypdf import PdfReader
-except Exception:  # pragma: no cover
-    PdfReader = None
-
-# Ưu tiên PyMuPDF4LLM nếu có (chất lượng trích xuất tốt hơn)
-try:
-    import fitz  # type: ignore  # PyMuPDF
-except Exception:  # pragma: no cover
-    fitz = None  # type: ignore
-
-try:
-    import pymupdf4llm  # type: ignore
-except Exception:  # pragma: no cover
-    pymupdf4llm = None  # type: ignore
-
 try:
     import docx  # python-docx
 except Exception:  # pragma: no cover
     docx = None
 
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    # Thử PyMuPDF4LLM trước (nếu có)
-    if pymupdf4llm is not None and fitz is not None:
-        try:
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            md_text = pymupdf4llm.to_markdown(doc)
-            try:
-                page_count = (
-                    getattr(doc, "page_count", None)
-                    or getattr(doc, "pageCount", None)
-                    or 0
-                )
-                print_debug(f"Đã tách PDF bằng PyMuPDF4LLM: {page_count} trang")
-            except Exception:
-                pass
-            return md_text
-        except Exception:
-            print_error("Lỗi PyMuPDF4LLM, fallback sang pypdf")
-
-    # Fallback: pypdf
-    if PdfReader is None:
-        print_error("pypdf chưa cài đặt")
-        raise RuntimeError("pypdf not installed")
-    from io import BytesIO
-
-    reader = PdfReader(BytesIO(file_bytes))
+def extract_pdf_pages(path: str, pool: Optional[Executor] = None, workers: int = PDF_EXTRACT_WORKERS) -> List[str]:
+    """Text từng trang theo thứ tự; có `pool` (process pool dùng chung) và PDF đủ lớn thì chia dải trang cho pool."""
+    started = time.time()
+    page_count = pdf_page_count(path)
+    workers = max(1, min(workers, page_count))
+    if pool is not None and workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+        # Nhiều dải nhỏ hơn số worker → cân bằng tải khi trang dày/mỏng khác nhau
+        step = math.ceil(page_count / (workers * 4))
+        starts = list(range(0, page_count, step))
+        stops = [min(page_count, s + step) for s in starts]
+        parts = list(pool.map(extract_page_range, [path] * len(starts), starts, stops))
+    else:
+        workers = 1
+        parts = [extract_page_range(path, 0, page_count)]
     pages: List[str] = []
-    for p in reader.pages:
-        try:
-            pages.append(
-                p.extract_text().replace("\n\n", "\n").replace("\n \n", "\n ") or ""
-            )
-        except Exception:
-            print_error("Lỗi extract_text trang PDF")
-            pages.append("")
-    print_debug(f"Đã tách {len(pages)} trang PDF (pypdf)")
-    return "\n\n".join(pages)
-
-
-def extract_text_from_docx(file_bytes: bytes) -> str:
+    for texts, errors in parts:
+        pages.extend(texts)
+        for error in errors:
+            print_error(error)
+    elapsed = max(time.time() - started, 1e-6)
+    print_info(f"Đã tách {page_count} trang PDF trong {elapsed:.1f}s ({page_count / elapsed:.1f} trang/s, {workers} worker)")
+    return pages
+
+
+def join_pages(pages: List[str]) -> Tuple[str, array]:
+    """Nối các trang bằng '\n\n'; trả kèm offset bắt đầu của từng trang trong text."""
+    starts = array("q")
+    pos = 0
+    for page in pages:
+        starts.append(pos)
+        pos += len(page) + 2
+    return "\n\n".join(pages), starts
+
+
+def extract_pdf_with_pages(path: str, pool: Optional[Executor] = None) -> Tuple[str, array]:
+    """(text, offset đầu mỗi trang) từ đường dẫn PDF."""
+    return join_pages(extract_pdf_pages(path, pool))
+
+
+def page_spans(page_starts: Sequence[int], offset: int, length: int) -> List[Tuple[int, int, int]]:
+    """Các trang mà đoạn text[offset:offset+length] trải qua: [(trang 1-based, start, end)] tương đối trong đoạn."""
+    first = bisect_right(page_starts, offset)
+    last = bisect_right(page_starts, offset + max(length, 1) - 1)
+    spans: List[Tuple[int, int, int]] = []
+    for page in range(max(first, 1), last + 1):
+        start = max(offset, page_starts[page - 1]) - offset
+        end = (min(offset + length, page_starts[page]) if page < len(page_starts) else offset + length) - offset
+        if end > start:
+            spans.append((page, start, end))
+    return spans
+
+
+def _stripped_span(text: str, start: int, end: int) -> Tuple[int, str]:
+    raw = text[start:end]
+    return start + len(raw) - len(raw.lstrip()), raw.strip()
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """Các dòng tách theo '\n' (không tạo list), bỏ dòng rỗng sau '\n' cuối."""
+    pos = 0
+    n = len(text)
+    while pos < n:
+        end = text.find("\n", pos)
+        if end == -1:
+            yield text[pos:]
+            return
+        yield text[pos:end]
+        pos = end + 1
+
+
+def iter_text_file_lines(path: str) -> Iterator[str]:
+    """Đọc file TXT từng dòng (UTF-8, bỏ ký tự lỗi) – không nạp cả file."""
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+def iter_docx_lines(path: str) -> Iterator[str]:
     if docx is None:
         print_error("python-docx chưa cài đặt")
         raise RuntimeError("python-docx not installed")
-    from io import BytesIO
+    for p in docx.Document(path).paragraphs:
+        yield p.text
 
-    doc = docx.Document(BytesIO(file_bytes))
-    paras = [p.text for p in doc.paragraphs]
-    print_debug(f"Đã tách {len(paras)} đoạn DOCX")
-    return "\n".join(paras)
 
+def _chapter(title: str, buf: List[str], start: int) -> Tuple[str, str, int]:
+    raw = "\n".join(buf)
+    return title, raw.strip(), start + len(raw) - len(raw.lstrip())
 
-def naive_split_chapters(text: str) -> List[Tuple[str, str]]:
-    """Tách (tiêu đề, nội dung) bằng regex đơn giản trên dòng heading."""
-    lines = text.splitlines()
-    chapters: List[Tuple[str, str]] = []
-    buf: List[str] = []
+
+def iter_chapters_with_offsets(lines: Iterable[str]) -> Iterator[Tuple[str, str, int]]:
+    """Sinh (tiêu đề, nội dung, offset nội dung trong text) theo dòng heading; chỉ giữ một chương trong bộ nhớ."""
     current_title = "Mở đầu"
     pattern = re.compile(r"^(Chương\s+\d+\b.*|Chapter\s+\d+\b.*)$", re.I)
+    buf: List[str] = []
+    buf_start = pos = 0
+    emitted = 0
     for line in lines:
         if pattern.match(line.strip()):
             if buf:
-                chapters.append((current_title, "\n".join(buf).strip()))
+                emitted += 1
+                yield _chapter(current_title, buf, buf_start)
                 buf = []
             current_title = line.strip()
         else:
+            if not buf:
+                buf_start = pos
             buf.append(line)
+        pos += len(line) + 1
     if buf:
-        chapters.append((current_title, "\n".join(buf).strip()))
-    if not chapters:
-        chapters.append(("Nội dung", text))
-    print_debug(f"Tách {len(chapters)} chương")
-    return chapters
+        emitted += 1
+        yield _chapter(current_title, buf, buf_start)
+    if not emitted:
+        yield "Nội dung", "", 0
 
 
-def chunk_by_chars(text: str, max_chars: int = 3000, overlap: int = 500) -> List[str]:
-    """Chia nhỏ theo ký tự, có overlap."""
-    chunks: List[str] = []
+def iter_chunk_spans(text: str, max_chars: int = 3000, overlap: int = 500) -> Iterator[Tuple[int, str]]:
+    """Chia nhỏ theo ký tự, có overlap; sinh (offset trong text, chunk đã strip)."""
     n = len(text)
     start = 0
     while start < n:
         end = min(n, start + max_chars)
-        chunks.append(text[start:end])
+        offset, chunk = _stripped_span(text, start, end)
+        if chunk:
+            yield offset, chunk
         if end == n:
             break
         start = max(0, end - overlap)
-    result = [c.strip() for c in chunks if c.strip()]
-    print_debug(f"Chia thành {len(result)} chunk")
-    return result
+
+
+def chunk_text_hash(text: str) -> str:
+    """md5 của chunk sau chuẩn hoá (NFC, gộp khoảng trắng) – khoá so khớp chunk khi ingest lại."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.md5(normalized.encode("utf-8")).hexdigest()
+
@@ -0,0 +1,131 @@
+"""
+Lắp context cho prompt theo ngân sách token.
+Ước lượng token rẻ (theo số ký tự), gộp chunk kề nhau cùng chương và bỏ phần overlap,
+bỏ/cắt chunk score thấp khi vượt ngân sách; giới hạn memory hội thoại.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Tiếng Việt có dấu ≈ 3.5 ký tự/token với tokenizer Gemini; chỉ cần đúng bậc để cắt prompt
+CHARS_PER_TOKEN = 3.5
+# Phần còn lại của ngân sách nhỏ hơn mức này thì bỏ hẳn chunk thay vì cắt cụt
+MIN_PARTIAL_TOKENS = 64
+# iter_chunk_spans dùng overlap 500 ký tự; dò rộng hơn một chút cho an toàn
+MAX_OVERLAP_CHARS = 1000
+# Nối các đoạn context; tính vào ngân sách
+CONTEXT_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token không cần gọi tokenizer/API."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+@dataclass
+class ContextPiece:
+    """Một chunk ứng viên cho context; `key` là vị trí của source tương ứng."""
+
+    key: int
+    chapter_id: int
+    chunk_index: int
+    score: float
+    text: str
+
+
+def _overlap(prev: str, nxt: str) -> int:
+    """Độ dài đoạn cuối `prev` trùng với đầu `nxt` (0 nếu không có)."""
+    probe = nxt[:64]
+    if not probe:
+        return 0
+    idx = prev.find(probe, max(0, len(prev) - MAX_OVERLAP_CHARS))
+    while idx != -1:
+        if nxt.startswith(prev[idx:]):
+            return len(prev) - idx
+        idx = prev.find(probe, idx + 1)
+    return 0
+
+
+def _merge_adjacent(pieces: List[ContextPiece]) -> List[Tuple[float, str, List[Tuple[int, int]]]]:
+    """Gộp các chunk liên tiếp (cùng chương, chunk_index liền nhau) thành một đoạn, bỏ phần lặp.
+
+    Trả [(score cao nhất, text, [(key, offset bắt đầu trong text)])].
+    """
+    groups: List[Tuple[float, str, List[Tuple[int, int]]]] = []
+    ordered = sorted(pieces, key=lambda p: (p.chapter_id, p.chunk_index))
+    i = 0
+    while i < len(ordered):
+        first = ordered[i]
+        text, score, members = first.text, first.score, [(first.key, 0)]
+        prev = first
+        i += 1
+        while i < len(ordered) and ordered[i].chapter_id == prev.chapter_id and ordered[i].chunk_index == prev.chunk_index + 1:
+            cur = ordered[i]
+            members.append((cur.key, len(text)))
+            text += cur.text[_overlap(prev.text, cur.text):]
+            score = max(score, cur.score)
+            prev = cur
+            i += 1
+        groups.append((score, text, members))
+    return groups
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cắt ở khoảng trắng gần nhất trước max_chars."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[: cut if cut > max_chars // 2 else max_chars].rstrip() + "…"
+
+
+def assemble_context(pieces: List[ContextPiece], max_tokens: int) -> Tuple[List[int], str, int]:
+    """Chọn đoạn theo score giảm dần cho tới khi hết ngân sách (tính cả ký tự nối giữa các đoạn).
+
+    Trả (key các chunk được dùng theo thứ tự trong context, context text, số token ước lượng).
+    """
+    groups = sorted(_merge_adjacent(pieces), key=lambda g: g[0], reverse=True)
+    budget_chars = math.floor(max_tokens * CHARS_PER_TOKEN)
+    keys: List[int] = []
+    parts: List[str] = []
+    used_chars = 0
+    for _, text, members in groups:
+        sep = len(CONTEXT_SEPARATOR) if parts else 0
+        if used_chars + sep + len(text) <= budget_chars:
+            parts.append(text)
+            keys.extend(key for key, _ in members)
+            used_chars += sep + len(text)
+            continue
+        remaining = budget_chars - used_chars - sep
+        if remaining < MIN_PARTIAL_TOKENS * CHARS_PER_TOKEN:
+            # Đoạn sau có thể ngắn hơn và vẫn vừa
+            continue
+        # _truncate có thể thêm "…" → chừa 1 ký tự
+        text = _truncate(text, remaining - 1)
+        parts.append(text)
+        keys.extend(key for key, offset in members if offset < len(text))
+        break
+    context = CONTEXT_SEPARATOR.join(parts)
+    return keys, context, estimate_tokens(context)
+
+
+def cap_memory(lines: List[str], max_tokens: int, max_line_chars: int = 600) -> str:
+    """Giữ các lượt hỏi–đáp gần nhất vừa ngân sách, bỏ theo cặp để không giữ câu trả lời mất câu hỏi.
+
+    `lines` xen kẽ người dùng/trợ lý; mỗi dòng (câu trả lời dài) cắt còn max_line_chars.
+    """
+    budget_chars = math.floor(max_tokens * CHARS_PER_TOKEN)
+    # Dòng lẻ đầu danh sách (trả lời đã mất câu hỏi khi cắt theo MEMORY_MAX_TURNS) bị bỏ
+    pairs = [lines[i : i + 2] for i in range(len(lines) % 2, len(lines), 2)]
+    kept: List[str] = []
+    used_chars = 0
+    for pair in reversed(pairs):
+        pair_lines = [_truncate(line, max_line_chars) for line in pair]
+        size = sum(len(line) for line in pair_lines) + len(pair_lines) - (0 if kept else 1)
+        if used_chars + size > budget_chars:
+            break
+        kept[:0] = pair_lines
+        used_chars += size
+    return "\n".join(kept)
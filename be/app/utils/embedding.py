@@ -6,10 +6,19 @@ Supports Google Generative AI embeddings (text-embedding-004).
 from __future__ import annotations
 
 from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 import os
 
-from app.core.config import GOOGLE_API_KEY, EMBEDDING_MODEL_ID, EMBEDDING_PROVIDER
+from app.core.config import (
+    GOOGLE_API_KEY,
+    EMBEDDING_MODEL_ID,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_CONCURRENCY,
+    EMBEDDING_CACHE_ENABLED,
+)
+from app.utils.embedding_cache import EmbeddingCache, get_embedding_cache
 from app.utils.color import print_error, print_debug
 
 
@@ -34,6 +43,8 @@ class GoogleEmbeddingProvider:
             print_error(f"[Embedding] genai.configure failed: {e}")
             # vẫn tiếp tục, lỗi sẽ được bắt ở bước gọi API
         self.model_id = model_id or EMBEDDING_MODEL_ID
+        self.batch_size = max(1, min(EMBEDDING_BATCH_SIZE, 100))
+        self.concurrency = max(1, EMBEDDING_BATCH_CONCURRENCY)
 
     def embed_text(self, text: str) -> List[float]:
         """Embed a single text string."""
@@ -42,6 +53,39 @@ class GoogleEmbeddingProvider:
         except Exception as e:
             print_error(f"[Embedding] embed_content failed: {e}")
             raise
+        return self._single_embedding(result)
+
+    async def aembed_text(self, text: str) -> List[float]:
+        """Bản async của embed_text (không chặn event loop)."""
+        try:
+            result = await genai.embed_content_async(model=self.model_id, content=text)
+        except Exception as e:
+            print_error(f"[Embedding] embed_content_async failed: {e}")
+            raise
+        return self._single_embedding(result)
+
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed nhiều câu truy vấn ngắn trong một request async (≤ batch_size)."""
+        if not texts:
+            return []
+        vectors: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i : i + self.batch_size]
+            try:
+                result = await genai.embed_content_async(model=self.model_id, content=batch)
+            except Exception as e:
+                print_error(f"[Embedding] batch embed_content_async failed ({len(batch)} texts): {e}")
+                raise
+            embeddings = getattr(result, "embedding", None)
+            if embeddings is None and isinstance(result, dict):
+                embeddings = result.get("embedding")
+            if embeddings is None or len(embeddings) != len(batch):
+                raise RuntimeError("Failed to obtain batch embeddings from Google API response")
+            vectors.extend(list(e) for e in embeddings)
+        return vectors
+
+    @staticmethod
+    def _single_embedding(result) -> List[float]:
         # google-generativeai may return dict or object with 'embedding'
         embedding = getattr(result, "embedding", None)
         if embedding is None and isinstance(result, dict):
@@ -50,14 +94,84 @@ class GoogleEmbeddingProvider:
             raise RuntimeError("Failed to obtain embedding from Google API response")
         return list(embedding)
 
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed nhiều text trong một request (batchEmbedContents)."""
+        try:
+            result = genai.embed_content(model=self.model_id, content=texts)
+        except Exception as e:
+            print_error(f"[Embedding] batch embed_content failed ({len(texts)} texts): {e}")
+            raise
+        embeddings = getattr(result, "embedding", None)
+        if embeddings is None and isinstance(result, dict):
+            embeddings = result.get("embedding")
+        if embeddings is None or len(embeddings) != len(texts):
+            raise RuntimeError("Failed to obtain batch embeddings from Google API response")
+        return [list(e) for e in embeddings]
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts theo batch, chạy song song có giới hạn, giữ thứ tự input."""
+        if not texts:
+            return []
+        batches = [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        print_debug(
+            f"[Embedding] {len(texts)} texts → {len(batches)} batches (concurrency={self.concurrency})"
+        )
+        vectors: List[List[float]] = []
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+            # map giữ thứ tự batch → thứ tự kết quả khớp input
+            for batch_vectors in pool.map(self._embed_batch, batches):
+                vectors.extend(batch_vectors)
+        return vectors
+
+
+class CachedEmbeddingProvider:
+    """Bọc provider thật: embed_text đi qua EmbeddingCache, embed_texts (chunk tài liệu) gọi thẳng."""
+
+    def __init__(self, provider, cache: EmbeddingCache):
+        self.provider = provider
+        self.cache = cache
+        self.model_id = provider.model_id
+
+    def embed_text(self, text: str) -> List[float]:
+        cached = self.cache.get(self.model_id, text)
+        if cached is not None:
+            return cached
+        vector = self.provider.embed_text(text)
+        self.cache.put(self.model_id, text, vector)
+        return vector
+
+    async def aembed_text(self, text: str) -> List[float]:
+        cached = await self.cache.aget(self.model_id, text)
+        if cached is not None:
+            return cached
+        vector = await self.provider.aembed_text(text)
+        await self.cache.aput_many(self.model_id, [(text, vector)])
+        return vector
+
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Câu truy vấn: lấy từ cache, chỉ embed phần miss trong một request."""
+        vectors: List[Optional[List[float]]] = [await self.cache.aget(self.model_id, t) for t in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = await self.provider.aembed_texts([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+            await self.cache.aput_many(self.model_id, [(texts[i], vectors[i]) for i in missing])
+        return vectors
+
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Embed a list of texts (simple loop)."""
-        return [self.embed_text(t) for t in texts]
+        return self.provider.embed_texts(texts)
 
 
 def get_embedding_provider():
     """Factory to get the configured embedding provider."""
     provider_name = (EMBEDDING_PROVIDER or "google").lower()
     if provider_name == "google":
-        return GoogleEmbeddingProvider()
-    raise ValueError(f"Unsupported EMBEDDING_PROVIDER: {EMBEDDING_PROVIDER}")
+        provider = GoogleEmbeddingProvider()
+    else:
+        raise ValueError(f"Unsupported EMBEDDING_PROVIDER: {EMBEDDING_PROVIDER}")
+    if EMBEDDING_CACHE_ENABLED:
+        return CachedEmbeddingProvider(provider, get_embedding_cache())
+    return provider
@@ -0,0 +1,209 @@
+"""
+Two-tier cache cho query embeddings.
+Tầng 1: LRU trong process (giới hạn số entry). Tầng 2: SQLite trên đĩa (float32 blob).
+Đường async (chat) tra LRU đồng bộ, còn đọc/ghi SQLite chạy trong thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import (
+    EMBEDDING_CACHE_MAX_SIZE,
+    EMBEDDING_CACHE_DISK_MAX_SIZE,
+    EMBEDDING_CACHE_PATH,
+)
+from app.utils.color import print_debug, print_warning
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hoá text làm khoá cache: NFC, lowercase, gộp khoảng trắng."""
+    text = unicodedata.normalize("NFC", text or "")
+    return _WS_RE.sub(" ", text).strip().lower()
+
+
+def cache_key(model_id: str, text: str) -> str:
+    raw = f"{model_id}\x00{normalize_text(text)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """LRU trong process + SQLite trên đĩa, có đếm hit/miss."""
+
+    def __init__(
+        self,
+        max_size: int = EMBEDDING_CACHE_MAX_SIZE,
+        db_path: Optional[str] = EMBEDDING_CACHE_PATH,
+        disk_max_size: int = EMBEDDING_CACHE_DISK_MAX_SIZE,
+    ) -> None:
+        self.max_size = max(0, int(max_size))
+        self.disk_max_size = max(0, int(disk_max_size))
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        # _lock: LRU + bộ đếm (giữ rất ngắn, gọi được từ event loop); _db_lock: kết nối SQLite
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._puts_since_trim = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "key TEXT PRIMARY KEY, model_id TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+                self._db.commit()
+            except Exception as e:
+                print_warning(f"[EmbeddingCache] Disk cache disabled: {e}")
+                self._db = None
+
+    def get(self, model_id: str, text: str) -> Optional[List[float]]:
+        key = cache_key(model_id, text)
+        vec = self._get_memory(key)
+        return vec if vec is not None else self._get_disk(key)
+
+    async def aget(self, model_id: str, text: str) -> Optional[List[float]]:
+        """Như get, nhưng đọc SQLite trong thread để không chặn event loop."""
+        key = cache_key(model_id, text)
+        vec = self._get_memory(key)
+        if vec is not None:
+            return vec
+        if self._db is None:
+            return self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def put(self, model_id: str, text: str, vector: List[float]) -> None:
+        self.put_many(model_id, [(text, vector)])
+
+    def put_many(self, model_id: str, items: List[Tuple[str, List[float]]]) -> None:
+        self._write_disk(self._remember_many(model_id, items))
+
+    async def aput_many(self, model_id: str, items: List[Tuple[str, List[float]]]) -> None:
+        """LRU cập nhật ngay; ghi SQLite (một transaction cho cả batch) trong thread."""
+        rows = self._remember_many(model_id, items)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, rows)
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+            return vec
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            vec = array("f", row[0]).tolist()
+            self._remember(key, vec)
+            # last_used ghi gộp ở lần _write_disk kế tiếp thay vì UPDATE + commit mỗi hit
+            self._touched[key] = time.time()
+            self.disk_hits += 1
+            return vec
+
+    def _remember_many(self, model_id: str, items: List[Tuple[str, List[float]]]) -> List[Tuple[str, str, bytes, float]]:
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in items:
+                key = cache_key(model_id, text)
+                self._remember(key, list(vector))
+                rows.append((key, model_id, array("f", vector).tobytes(), now))
+        return rows
+
+    def _write_disk(self, rows: List[Tuple[str, str, bytes, float]]) -> None:
+        if self._db is None:
+            return
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings(key, model_id, vector, last_used) VALUES (?, ?, ?, ?)", rows
+                )
+                if touched:
+                    self._db.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(ts, key) for key, ts in touched.items()]
+                    )
+                self._db.commit()
+                self._puts_since_trim += len(rows)
+                if self.disk_max_size and self._puts_since_trim >= 100:
+                    self._trim_disk()
+        except Exception as e:
+            print_warning(f"[EmbeddingCache] Disk write failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        disk_size = 0
+        if self._db is not None:
+            with self._db_lock:
+                disk_size = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        with self._lock:
+            return {
+                "memory_size": len(self._lru),
+                "memory_max_size": self.max_size,
+                "disk_size": disk_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        # Caller giữ self._lock
+        if self.max_size <= 0:
+            return
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    def _trim_disk(self) -> None:
+        # Caller giữ self._db_lock; xoá các entry ít dùng nhất khi vượt giới hạn
+        self._puts_since_trim = 0
+        total = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = total - self.disk_max_size
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._db.commit()
+            print_debug(f"[EmbeddingCache] Trimmed {overflow} disk entries")
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Singleton cache cho cả process."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
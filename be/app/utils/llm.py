@@ -99,6 +99,24 @@ def build_prompt(
     return prompt_str
 
 
+def message_text(message) -> str:
+    """Lấy text từ message/chunk LangChain (content có thể là str hoặc list block)."""
+    content = getattr(message, "content", message)
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts: List[str] = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type", "text") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+    return str(content)
+
+
 async def stream_answer(
     question: str,
     context: str,
@@ -114,9 +132,7 @@ async def stream_answer(
         memory_text=memory_text,
     )
     async for chunk in chat.astream(prompt_text):
-        text = getattr(chunk, "content", None)
-        if not text:
-            text = str(chunk)
+        text = message_text(chunk)
         if text:
             yield text
 
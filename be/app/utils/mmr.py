@@ -0,0 +1,49 @@
+"""
+Maximal Marginal Relevance (MMR) bằng NumPy.
+Chọn k ứng viên vừa liên quan tới câu hỏi vừa khác nhau (loại các chunk kề nhau gần trùng do overlap).
+"""
+
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import numpy as np
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def mmr_select(
+    query_vector: Sequence[float],
+    candidate_vectors: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """Trả index ứng viên theo thứ tự chọn: argmax λ·sim(q, d) − (1−λ)·max sim(d, đã chọn)."""
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    candidates = _unit_rows(candidates)
+    query = _unit_rows(np.asarray(query_vector, dtype=np.float32))
+    relevance = candidates @ query
+    # Ma trận cosine giữa các ứng viên (pool nhỏ → n×n rẻ)
+    pairwise = candidates @ candidates.T
+
+    selected: List[int] = []
+    # max_sim[i] = độ giống lớn nhất giữa ứng viên i và các ứng viên đã chọn (chưa chọn gì → không phạt)
+    max_sim = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(min(k, n)):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        if selected:
+            max_sim = np.maximum(max_sim, pairwise[best])
+        else:
+            max_sim = pairwise[best].copy()
+        selected.append(best)
+        available[best] = False
+    return selected
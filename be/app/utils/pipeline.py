@@ -0,0 +1,121 @@
+"""
+Pipeline nhiều stage chạy chồng lấn (mỗi stage một thread, nối bằng Queue có giới hạn).
+Dùng cho ingest: chunk → insert SQL → embed → upsert Qdrant.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Sequence, Tuple
+
+from app.utils.color import print_info
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Thống kê một stage: số item/batch và thời gian xử lý thực (không tính chờ queue)."""
+
+    name: str
+    items: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+
+def _size(batch: Any) -> int:
+    try:
+        return len(batch)
+    except TypeError:
+        return 1
+
+
+def run_pipeline(
+    source: Iterable[Any],
+    stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+    maxsize: int = 2,
+) -> List[StageStats]:
+    """Chạy `source` → stage1 → stage2 … song song; batch N của stage k chồng lấn batch N±1 của stage kề.
+
+    Queue giới hạn `maxsize` để stage nhanh không chạy quá xa (giới hạn bộ nhớ).
+    Lỗi ở bất kỳ stage nào dừng cả pipeline và được raise lại ở thread gọi.
+    """
+    queues = [queue.Queue(maxsize=max(1, maxsize)) for _ in stages]
+    stats = [StageStats(name=name) for name, _ in stages]
+    errors: List[BaseException] = []
+    stop = threading.Event()
+
+    def _put(q: queue.Queue, item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(q: queue.Queue) -> Any:
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(e: BaseException) -> None:
+        errors.append(e)
+        stop.set()
+
+    def feed() -> None:
+        try:
+            for batch in source:
+                if not _put(queues[0], batch):
+                    return
+        except BaseException as e:
+            _fail(e)
+        finally:
+            _put(queues[0], _DONE)
+
+    def work(index: int, fn: Callable[[Any], Any]) -> None:
+        out = queues[index + 1] if index + 1 < len(stages) else None
+        st = stats[index]
+        try:
+            while True:
+                batch = _get(queues[index])
+                if batch is _DONE:
+                    break
+                t0 = time.perf_counter()
+                result = fn(batch)
+                st.seconds += time.perf_counter() - t0
+                st.batches += 1
+                st.items += _size(batch)
+                if out is not None and not _put(out, result):
+                    return
+        except BaseException as e:
+            _fail(e)
+        finally:
+            if out is not None:
+                _put(out, _DONE)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=feed, name='pipeline-source', daemon=True)]
+    for i, (name, fn) in enumerate(stages):
+        threads.append(threading.Thread(target=work, args=(i, fn), name=f'pipeline-{name}', daemon=True))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+    wall = time.perf_counter() - started
+    summary = ', '.join(f'{s.name}={s.items} items/{s.seconds:.2f}s ({s.items_per_second:.1f}/s)' for s in stats)
+    print_info(f'[pipeline] wall={wall:.2f}s | {summary}')
+    return stats
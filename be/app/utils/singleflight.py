@@ -0,0 +1,79 @@
+"""
+Single-flight cho coroutine/async stream.
+Các request đồng thời cùng key dùng chung một lần thực thi (một lần embed, search, gọi LLM).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.utils.color import print_debug
+
+
+class _Broadcast:
+    """Chạy một async generator và phát lại mọi event cho từng subscriber (kể cả subscriber đến muộn)."""
+
+    def __init__(self, source: AsyncIterator[Any]) -> None:
+        self.events: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self._cond = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]) -> None:
+        try:
+            async for event in source:
+                async with self._cond:
+                    self.events.append(event)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: index < len(self.events) or self.finished)
+                batch = self.events[index:]
+                index = len(self.events)
+                finished = self.finished
+            for event in batch:
+                yield event
+            if finished:
+                break
+        if self.error is not None:
+            raise self.error
+
+
+class SingleFlight:
+    """Gộp request trùng key đang chạy; việc chạy trong task riêng nên client ngắt kết nối không huỷ phần dùng chung."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _t, k=key: self._calls.pop(k, None))
+        else:
+            print_debug(f"[SingleFlight] join in-flight call key={key[:60]}")
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast(factory())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda _t, k=key: self._streams.pop(k, None))
+        else:
+            print_debug(f"[SingleFlight] join in-flight stream key={key[:60]}")
+        async for event in broadcast.subscribe():
+            yield event
@@ -9,6 +9,9 @@ from sqlmodel import Session, select, func
 from app.core.database import engine
 from app.models import Document, Post, Chunk, Report
 from app.schemas.common_types import StatsResponse
+from app.core.config import EMBEDDING_CACHE_ENABLED, ANSWER_CACHE_ENABLED
+from app.utils.embedding_cache import get_embedding_cache
+from app.utils.answer_cache import get_answer_cache
 
 
 async def get_system_stats() -> StatsResponse:
@@ -30,9 +33,14 @@ async def get_system_stats() -> StatsResponse:
         # Count total reports
         total_reports = session.exec(select(func.count(Report.id))).one()
 
+    # stats() đếm dòng SQLite của embedding cache → chạy trong thread, không chặn event loop
+    embedding_cache = await asyncio.to_thread(get_embedding_cache().stats) if EMBEDDING_CACHE_ENABLED else None
+
     return StatsResponse(
         total_documents=total_documents,
         total_articles=total_articles,
         total_chunks=total_chunks,
         total_reports=total_reports,
+        embedding_cache=embedding_cache,
+        answer_cache=get_answer_cache().stats() if ANSWER_CACHE_ENABLED else None,
     )
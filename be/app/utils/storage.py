@@ -0,0 +1,65 @@
+"""
+Ghi file upload ra đĩa theo từng khối, vừa ghi vừa băm (không giữ cả file trong bộ nhớ).
+File gốc lưu theo nội dung: STORAGE_DIR/<md5>.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import BinaryIO, Optional, Tuple
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """File upload vượt UPLOAD_MAX_BYTES."""
+
+
+def spool_to_file(src: BinaryIO, dest_path: str, max_bytes: Optional[int] = None) -> Tuple[str, int]:
+    """Copy src → dest_path theo khối 1MB; trả (md5 hex, số byte). Vượt max_bytes → xoá file dở và raise."""
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    digest = hashlib.md5()
+    size = 0
+    try:
+        with open(dest_path, "wb") as out:
+            while True:
+                block = src.read(SPOOL_CHUNK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLargeError(f"file exceeds {max_bytes} bytes")
+                digest.update(block)
+                out.write(block)
+    except BaseException:
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise
+    return digest.hexdigest(), size
+
+
+def file_md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(SPOOL_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_original(src_path: str, content_hash: str, root: str) -> str:
+    """Chuyển file đã spool về root/<content_hash> (content-addressed); trả đường dẫn lưu."""
+    dest_path = os.path.join(root, content_hash)
+    os.makedirs(root, exist_ok=True)
+    os.replace(src_path, dest_path)
+    return dest_path
+
+
+def discard_file(path: str) -> None:
+    """Xoá file nếu còn (file spool có thể đã được store_original chuyển đi)."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
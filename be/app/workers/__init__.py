@@ -0,0 +1,4 @@
+"""
+Hàm chạy trong worker process (spawn).
+Không import gì từ app.* khác: process con chỉ nạp module này, không kéo theo config/embedding/DB.
+"""
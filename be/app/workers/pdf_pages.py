@@ -0,0 +1,65 @@
+"""
+Tách text PDF theo dải trang; chạy trong process pool của IngestionJobService hoặc ngay trong process chính.
+Chỉ phụ thuộc thư viện PDF — worker spawn import module này nhanh. Lỗi trả về dạng chuỗi để process cha log.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+try:
+    from pypdf import PdfReader
+except Exception:  # pragma: no cover
+    PdfReader = None
+
+# Ưu tiên PyMuPDF4LLM nếu có (chất lượng trích xuất tốt hơn)
+try:
+    import fitz  # type: ignore  # PyMuPDF
+except Exception:  # pragma: no cover
+    fitz = None  # type: ignore
+
+try:
+    import pymupdf4llm  # type: ignore
+except Exception:  # pragma: no cover
+    pymupdf4llm = None  # type: ignore
+
+
+def pdf_page_count(path: str) -> int:
+    if fitz is not None:
+        with fitz.open(path) as doc:
+            return doc.page_count
+    if PdfReader is None:
+        raise RuntimeError("pypdf not installed")
+    return len(PdfReader(path).pages)
+
+
+def _pypdf_page_text(page) -> Tuple[str, Optional[str]]:
+    try:
+        return page.extract_text().replace("\n\n", "\n").replace("\n \n", "\n ") or "", None
+    except Exception as e:
+        return "", f"Lỗi extract_text trang PDF: {e}"
+
+
+def extract_page_range(path: str, start: int, stop: int) -> Tuple[List[str], List[str]]:
+    """(text từng trang [start, stop), các lỗi gặp phải); tự mở PDF từ đường dẫn."""
+    errors: List[str] = []
+    # Thử PyMuPDF4LLM trước (nếu có)
+    if pymupdf4llm is not None and fitz is not None:
+        try:
+            with fitz.open(path) as doc:
+                page_chunks = pymupdf4llm.to_markdown(doc, pages=list(range(start, stop)), page_chunks=True)
+            return [c.get("text") or "" for c in page_chunks], errors
+        except Exception as e:
+            errors.append(f"Lỗi PyMuPDF4LLM (trang {start}-{stop - 1}), fallback sang pypdf: {e}")
+
+    # Fallback: pypdf
+    if PdfReader is None:
+        raise RuntimeError("pypdf not installed")
+    reader = PdfReader(path)
+    pages: List[str] = []
+    for i in range(start, stop):
+        text, error = _pypdf_page_text(reader.pages[i])
+        pages.append(text)
+        if error:
+            errors.append(error)
+    return pages, errors
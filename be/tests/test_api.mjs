@@ -41,7 +41,23 @@ async function testCorpusUpload() {
   assertOk(res.ok, 'upload not ok');
   const json = await res.json();
   console.log('upload:', json);
-  return json.document_id;
+  return waitForJob(json.job_id);
+}
+
+async function waitForJob(jobId, timeoutMs = 120000) {
+  const started = Date.now();
+  while (Date.now() - started < timeoutMs) {
+    const res = await fetch(`${BASE}/corpus/jobs/${jobId}`, { headers: { 'X-Admin-Token': '11minhan' } });
+    assertOk(res.ok, 'job status not ok');
+    const job = await res.json();
+    if (job.state === 'done') {
+      console.log('job:', job);
+      return job.result.document_id;
+    }
+    assertOk(job.state !== 'failed', `ingest job failed: ${job.error}`);
+    await sleep(1000);
+  }
+  throw new Error('ingest job timeout');
 }
 
 async function testCorpusDelete(documentId) {
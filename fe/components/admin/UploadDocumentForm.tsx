@@ -1,6 +1,6 @@
 "use client";
 import { useRef, useState } from "react";
-import { uploadDocument } from "@/services/docs";
+import { uploadDocument, waitForIngestJob } from "@/services/docs";
 
 export default function UploadDocumentForm({ onUploaded }: { onUploaded?: () => void }) {
   const fileRef = useRef<HTMLInputElement>(null);
@@ -10,6 +10,7 @@ export default function UploadDocumentForm({ onUploaded }: { onUploaded?: () =>
   const [adminToken, setAdminToken] = useState("");
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [progress, setProgress] = useState<string | null>(null);
 
   return (
     <form
@@ -21,8 +22,17 @@ export default function UploadDocumentForm({ onUploaded }: { onUploaded?: () =>
         if (!file) { setError("Chọn tệp"); return; }
         const effectiveTitle = title || file.name.replace(/\.[^.]+$/, "");
         setLoading(true);
+        setProgress("Đang tải lên...");
         try {
-          await uploadDocument({ file, title: effectiveTitle, description: description || undefined, source: source || undefined }, adminToken || undefined);
+          const queued = await uploadDocument({ file, title: effectiveTitle, description: description || undefined, source: source || undefined }, adminToken || undefined);
+          // Backend ingest nền → chờ job xong mới báo thành công/làm mới danh sách
+          const job = await waitForIngestJob(queued.job_id, adminToken || undefined, (j) => {
+            setProgress(j.state === "queued" ? "Đang chờ xử lý..." : `Đang xử lý: ${j.stage || "..."}`);
+          });
+          if (job.state === "failed") {
+            setError(job.error ? `Upload thất bại: ${job.error}` : "Upload thất bại");
+            return;
+          }
           setTitle(""); setDescription(""); setSource(""); if (fileRef.current) fileRef.current.value = "";
           onUploaded?.();
         // eslint-disable-next-line @typescript-eslint/no-explicit-any
@@ -30,6 +40,7 @@ export default function UploadDocumentForm({ onUploaded }: { onUploaded?: () =>
           setError(err?.message || "Upload thất bại");
         } finally {
           setLoading(false);
+          setProgress(null);
         }
       }}
     >
@@ -53,6 +64,7 @@ export default function UploadDocumentForm({ onUploaded }: { onUploaded?: () =>
         <label className="mb-1 block text-sm">X-Admin-Token</label>
         <input value={adminToken} onChange={(e) => setAdminToken(e.target.value)} className="w-full rounded-xl border px-3 py-2" placeholder="Nhập nếu backend yêu cầu" />
       </div>
+      {progress ? <div className="text-sm text-foreground/70">{progress}</div> : null}
       {error ? <div className="text-sm text-red-600">{error}</div> : null}
       <div className="text-right">
         <button disabled={loading} className="rounded-xl bg-brand px-4 py-2 text-surface hover:bg-brand-600 disabled:opacity-60">
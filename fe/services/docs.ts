@@ -40,10 +40,30 @@ export async function deleteDocument(documentId: number, adminToken?: string): P
   return res.json();
 }
 
+export type IngestJobState = "queued" | "running" | "done" | "failed";
+
+export type IngestJobStage = {
+  name: string;
+  status: "pending" | "running" | "done" | "failed";
+  done: number;
+  total?: number | null;
+};
+
+export type IngestJob = {
+  status: string;
+  job_id: string;
+  title: string;
+  state: IngestJobState;
+  stage?: string | null;
+  stages?: IngestJobStage[];
+  result?: { document_id: number; chapter_count: number; chunk_count: number; message?: string | null } | null;
+  error?: string | null;
+};
+
 export async function uploadDocument(
   params: { file: File; title: string; description?: string; source?: string },
   adminToken?: string,
-): Promise<{ status: string; document_id: number; chapter_count: number; chunk_count: number }> {
+): Promise<IngestJob> {
   const fd = new FormData();
   fd.append("file", params.file);
   fd.append("title", params.title);
@@ -63,6 +83,35 @@ export async function uploadDocument(
   return res.json();
 }
 
+export async function fetchIngestJob(jobId: string, adminToken?: string): Promise<IngestJob> {
+  const res = await fetch(`${API_BASE}/corpus/jobs/${encodeURIComponent(jobId)}`, {
+    cache: "no-store",
+    headers: {
+      ...(adminToken ? { "X-Admin-Token": adminToken } : {}),
+    },
+  });
+  if (!res.ok) {
+    const t = await res.text();
+    throw new Error(`Fetch job failed: ${res.status} ${t}`);
+  }
+  return res.json();
+}
+
+// Ingest chạy nền: hỏi trạng thái job tới khi done/failed
+export async function waitForIngestJob(
+  jobId: string,
+  adminToken?: string,
+  onProgress?: (job: IngestJob) => void,
+  intervalMs = 1500,
+): Promise<IngestJob> {
+  for (;;) {
+    const job = await fetchIngestJob(jobId, adminToken);
+    onProgress?.(job);
+    if (job.state === "done" || job.state === "failed") return job;
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
+
 export type ChapterSummary = { id: number; title: string; summary?: string | null; ordering: number };
 export type DocumentDetailResponse = { id: number; title: string; summary?: string | null; cover_image?: string | null; chapters: ChapterSummary[] };
 